@@ -0,0 +1,26 @@
+"""
+Benchmarks for conversions between images, series, and blocks.
+"""
+from thunder import images
+
+
+class Conversions(object):
+    params = [(10, 100), (64, 256)]
+    param_names = ['nimages', 'size']
+
+    def setup(self, nimages, size):
+        self.images = images.fromrandom(shape=(nimages, size, size))
+        self.series = self.images.toseries()
+        self.blocks = self.images.toblocks()
+
+    def time_toseries(self, nimages, size):
+        self.images.toseries().toarray()
+
+    def time_toimages(self, nimages, size):
+        self.series.toimages().toarray()
+
+    def time_toblocks(self, nimages, size):
+        self.images.toblocks().toarray()
+
+    def time_blocks_toimages(self, nimages, size):
+        self.blocks.toimages().toarray()
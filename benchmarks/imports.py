@@ -0,0 +1,15 @@
+"""
+Benchmarks for the time taken to import thunder.
+
+Each benchmark runs in a fresh interpreter, so modules
+imported by earlier benchmarks are not counted.
+"""
+
+
+def timeraw_import_thunder():
+    return "import thunder"
+
+
+def timeraw_import_numpy():
+    # baseline, as numpy is always imported by thunder
+    return "import numpy"
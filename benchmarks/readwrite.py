@@ -0,0 +1,69 @@
+"""
+Benchmarks for reading and writing images and series.
+
+Files are written from synthetic data into a temporary directory
+before each benchmark, and removed afterwards.
+"""
+import shutil
+import tempfile
+from os.path import join
+
+from thunder import images, series
+
+
+class ImagesReaders(object):
+    params = [(10, 100), (64, 256)]
+    param_names = ['nimages', 'size']
+
+    def setup(self, nimages, size):
+        self.path = tempfile.mkdtemp()
+        data = images.fromrandom(shape=(nimages, size, size))
+        data.tobinary(join(self.path, 'binary'))
+        data.totif(join(self.path, 'tif'))
+        data.topng(join(self.path, 'png'))
+
+    def teardown(self, nimages, size):
+        shutil.rmtree(self.path)
+
+    def time_frombinary(self, nimages, size):
+        images.frombinary(join(self.path, 'binary')).toarray()
+
+    def time_fromtif(self, nimages, size):
+        images.fromtif(join(self.path, 'tif')).toarray()
+
+    def time_frompng(self, nimages, size):
+        images.frompng(join(self.path, 'png')).toarray()
+
+
+class ImagesWriters(object):
+    params = [(10, 100), (64, 256)]
+    param_names = ['nimages', 'size']
+
+    def setup(self, nimages, size):
+        self.path = tempfile.mkdtemp()
+        self.data = images.fromrandom(shape=(nimages, size, size))
+
+    def teardown(self, nimages, size):
+        shutil.rmtree(self.path)
+
+    def time_tobinary(self, nimages, size):
+        self.data.tobinary(join(self.path, 'binary'), overwrite=True)
+
+
+class SeriesIO(object):
+    params = [(1000, 10000), (100, 1000)]
+    param_names = ['nrecords', 'length']
+
+    def setup(self, nrecords, length):
+        self.path = tempfile.mkdtemp()
+        self.data = series.fromrandom(shape=(nrecords, length))
+        self.data.tobinary(join(self.path, 'binary'))
+
+    def teardown(self, nrecords, length):
+        shutil.rmtree(self.path)
+
+    def time_frombinary(self, nrecords, length):
+        series.frombinary(join(self.path, 'binary')).toarray()
+
+    def time_tobinary(self, nrecords, length):
+        self.data.tobinary(join(self.path, 'written'), overwrite=True)
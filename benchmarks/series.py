@@ -0,0 +1,38 @@
+"""
+Benchmarks for methods of series.
+"""
+from numpy import random
+
+from thunder import series
+
+
+class SeriesMethods(object):
+    timeout = 300
+    params = [(1000, 10000), (100, 1000)]
+    param_names = ['nrecords', 'length']
+
+    def setup(self, nrecords, length):
+        self.data = series.fromrandom(shape=(nrecords, length))
+        self.signal = random.RandomState(0).randn(length)
+        self.signals = random.RandomState(0).randn(10, length)
+
+    def time_detrend_linear(self, nrecords, length):
+        self.data.detrend('linear').toarray()
+
+    def time_detrend_nonlinear(self, nrecords, length):
+        self.data.detrend('nonlinear', order=5).toarray()
+
+    def time_normalize_percentile(self, nrecords, length):
+        self.data.normalize('percentile').toarray()
+
+    def time_normalize_window(self, nrecords, length):
+        self.data.normalize('window', window=10).toarray()
+
+    def time_fourier(self, nrecords, length):
+        self.data.fourier(freq=5).toarray()
+
+    def time_correlate(self, nrecords, length):
+        self.data.correlate(self.signal).toarray()
+
+    def time_correlate_many(self, nrecords, length):
+        self.data.correlate(self.signals).toarray()
@@ -1,5 +1,5 @@
 import pytest
-from numpy import allclose, array, asarray, add, ndarray, generic
+from numpy import allclose, array, asarray, add, ndarray, generic, arange
 
 from thunder import series, images
 
@@ -81,6 +81,9 @@ def test_reduce(eng):
     reduced = data.reduce(lambda x, y: x + y)
     assert allclose(reduced.shape, [1, 3])
     assert allclose(reduced.toarray(), [5, 7, 9])
+    if eng is None:
+        reduced = data.reduce(lambda x, y: x + y, fanin=2)
+        assert allclose(reduced.toarray(), [5, 7, 9])
 
 
 def test_map(eng):
@@ -104,6 +107,78 @@ def test_map_with_keys(eng):
     assert allclose(mapped.toarray(), [[[1, 1], [1, 1]], [[3, 3], [3, 3]]])
 
 
+def test_map_dtype(eng):
+    data = series.fromlist([array([1, 2]), array([3, 4])], engine=eng)
+    mapped = data.map(lambda x: x if x[0] < 2 else x * 0.5)
+    assert allclose(mapped.toarray(), [[1, 2], [1.5, 2]])
+    mapped = data.map(lambda x: x * 1.5, dtype='float32')
+    assert mapped.dtype == 'float32'
+    assert allclose(mapped.toarray(), [[1.5, 3], [4.5, 6]])
+    mapped = data.map(lambda x: x.sum(), value_shape=(1,), dtype='int64')
+    assert allclose(mapped.shape, [2, 1])
+    assert allclose(mapped.toarray(), [3, 7])
+
+
+def test_map_batch(eng):
+    data = series.fromlist([array([1, 2, 3]), array([4, 5, 6]), array([7, 8, 9])], engine=eng)
+    mapped = data.map(lambda x: x.sum(axis=1), batch=True)
+    assert allclose(mapped.shape, [3, 1])
+    assert allclose(mapped.toarray(), [6, 15, 24])
+    mapped = data.map(lambda x: x - x.mean(axis=1)[:, None], batch=2)
+    assert allclose(mapped.toarray(), [[-1, 0, 1], [-1, 0, 1], [-1, 0, 1]])
+    mapped = data.map(lambda kv: kv[1] + kv[0], with_keys=True, batch=2)
+    assert allclose(mapped.toarray(), [[1, 2, 3], [5, 6, 7], [9, 10, 11]])
+    data = images.fromlist([array([[1, 1], [1, 1]]), array([[2, 2], [2, 2]])], engine=eng)
+    mapped = data.map(lambda x: x * 2, batch=True)
+    assert allclose(mapped.shape, [2, 2, 2])
+    assert allclose(mapped.toarray(), [[[2, 2], [2, 2]], [[4, 4], [4, 4]]])
+
+
+def test_lazy(eng):
+    if eng is None:
+        calls = []
+        data = series.fromlist([array([1, 2, 3]), array([4, 5, 6])]).lazy()
+        mapped = data.map(lambda x: calls.append(1) or x * 2).plus(1).map(lambda x: x.sum())
+        assert calls == [1]
+        assert allclose(mapped.shape, [2, 1])
+        assert allclose(mapped.toarray(), [15, 33])
+        assert calls == [1, 1, 1]
+        assert allclose(mapped.toarray(), [15, 33])
+        assert calls == [1, 1, 1]
+        mapped = data.minus(data.toarray()).map(lambda x: x - x.mean(axis=1)[:, None], batch=1)
+        assert allclose(mapped.toarray(), [[0, 0, 0], [0, 0, 0]])
+        mapped = data.map(lambda kv: kv[1] + kv[0], with_keys=True).filter(lambda x: x[0] > 2)
+        assert allclose(mapped.toarray(), [5, 6, 7])
+        data = images.fromlist([array([[1, 1], [1, 1]]), array([[2, 2], [2, 2]])]).lazy()
+        mapped = data.map(lambda x: x * 2).toseries().map(lambda x: x.sum())
+        assert allclose(mapped.toarray(), [[6, 6], [6, 6]])
+
+
+def test_lazy_copy(eng):
+    if eng is None:
+        calls = []
+        data = series.fromlist([array([1, 2, 3]), array([4, 5, 6])], index=[2, 3, 4], labels=[0, 1])
+        lazy = data.lazy()
+        assert lazy is not data
+        assert allclose(lazy.index, [2, 3, 4])
+        assert allclose(lazy.labels, [0, 1])
+        data.map(lambda x: calls.append(1) or x)
+        assert calls == [1, 1]
+        lazy.map(lambda x: calls.append(1) or x)
+        assert calls == [1, 1, 1]
+
+
+def test_lazy_dtype(eng):
+    if eng is None:
+        x = arange(12.0).reshape(3, 4) * 100
+        for batch in [False, 2]:
+            chain = lambda d: d.map(lambda v: v, dtype='uint8', batch=batch).map(lambda v: v + 1)
+            eager = chain(series.fromarray(x))
+            lazy = chain(series.fromarray(x).lazy())
+            assert lazy.dtype == eager.dtype
+            assert (lazy.toarray() == eager.toarray()).all()
+
+
 def test_repartition(eng):
     if eng is not None:
         data = images.fromlist([array([1, 1]), array([2, 2]), array([3, 3]), array([4, 4]),
@@ -0,0 +1,128 @@
+import os
+import pytest
+from numpy import allclose, arange, save, load
+
+from thunder import series, images, set_memory_budget
+from thunder.disk import isdisk
+from thunder.series.readers import frombinary
+
+pytestmark = pytest.mark.usefixtures("eng")
+
+
+@pytest.fixture
+def budget():
+    # a budget of 64 bytes will hold a few records at a time
+    set_memory_budget(64)
+    yield
+    set_memory_budget()
+
+
+def ondisk(tmpdir, arr):
+    path = os.path.join(str(tmpdir), 'data.npy')
+    save(path, arr)
+    return load(path, mmap_mode='r')
+
+
+def test_isdisk(tmpdir, eng):
+    arr = arange(24).reshape(2, 3, 4)
+    assert not isdisk(arr)
+    assert isdisk(ondisk(tmpdir, arr))
+    assert isdisk(images.fromarray(ondisk(tmpdir, arr)).values)
+
+
+def test_map(tmpdir, budget, eng):
+    arr = arange(6 * 4 * 4).reshape(6, 4, 4)
+    data = images.fromarray(ondisk(tmpdir, arr))
+    mapped = data.map(lambda x: x * 2)
+    assert isdisk(mapped.values)
+    assert allclose(mapped.toarray(), arr * 2)
+    mapped = data.map(lambda kv: kv[1].sum() + kv[0][0], with_keys=True)
+    assert allclose(mapped.toarray(), arr.sum(axis=(1, 2)) + arange(6))
+    mapped = data.map(lambda x: x.reshape(len(x), -1).sum(axis=1), batch=True)
+    assert allclose(mapped.toarray(), arr.sum(axis=(1, 2)))
+    mapped = data.map(lambda x: x if x[0, 0] < 48 else x * 0.5)
+    assert allclose(mapped.toarray()[:3], arr[:3])
+    assert allclose(mapped.toarray()[3:], arr[3:] * 0.5)
+
+
+def test_filter(tmpdir, budget, eng):
+    arr = arange(6 * 4 * 4).reshape(6, 4, 4)
+    data = images.fromarray(ondisk(tmpdir, arr))
+    filtered = data.filter(lambda x: x[0, 0] % 32 == 0)
+    assert isdisk(filtered.values)
+    assert allclose(filtered.toarray(), arr[[0, 2, 4]])
+
+
+def test_elementwise(tmpdir, budget, eng):
+    arr = arange(6 * 4 * 4).reshape(6, 4, 4)
+    data = images.fromarray(ondisk(tmpdir, arr))
+    assert allclose(data.plus(data).toarray(), arr * 2)
+    assert allclose(data.minus(arr).toarray(), arr * 0)
+
+
+def test_conversions(tmpdir, budget, eng):
+    arr = arange(6 * 4 * 4).reshape(6, 4, 4)
+    data = images.fromarray(ondisk(tmpdir, arr)).toseries()
+    assert isdisk(data.values)
+    assert allclose(data.toarray(), arr.transpose(1, 2, 0))
+    mapped = data.map(lambda x: x - x.mean())
+    assert allclose(mapped.toarray(), arr.transpose(1, 2, 0) - arr.mean(axis=0)[:, :, None])
+    data = data.toimages()
+    assert isdisk(data.values)
+    assert allclose(data.toarray(), arr)
+
+
+def test_stats(tmpdir, budget, eng):
+    arr = arange(6 * 4 * 4).reshape(6, 4, 4) % 7
+    data = images.fromarray(ondisk(tmpdir, arr))
+    for stat in ['mean', 'var', 'std', 'sum', 'max', 'min']:
+        result = getattr(data, stat)()
+        assert allclose(result.toarray(), getattr(arr, stat)(axis=0))
+        assert result.dtype == getattr(arr, stat)(axis=0).dtype
+    data = series.fromarray(ondisk(tmpdir, arr.astype('float32')))
+    for stat in ['mean', 'var', 'std', 'sum', 'max', 'min']:
+        result = getattr(data, stat)()
+        assert allclose(result.toarray(), getattr(arr, stat)(axis=(0, 1)))
+        assert str(result.dtype) == 'float32'
+
+
+def test_foreach(tmpdir, budget, eng):
+    arr = arange(6 * 4 * 4).reshape(6, 4, 4)
+    data = images.fromarray(ondisk(tmpdir, arr))
+    keys = []
+    data.foreach(lambda kv: keys.append(kv[0]))
+    assert keys == list(range(6))
+
+
+def test_series_tobinary(tmpdir, budget, eng):
+    arr = arange(6 * 4 * 4).reshape(6, 4, 4)
+    data = series.fromarray(ondisk(tmpdir, arr))
+    path = os.path.join(str(tmpdir), 'binary')
+    data.tobinary(path)
+    assert len([f for f in os.listdir(path) if f.endswith('.bin')]) > 1
+    loaded = frombinary(path)
+    assert allclose(loaded.toarray(), arr)
+
+
+def test_extract_rois(tmpdir, budget, eng):
+    arr = arange(6 * 4 * 4).reshape(6, 4, 4)
+    data = images.fromarray(ondisk(tmpdir, arr))
+    labels = (arange(16).reshape(4, 4) % 2) + 1
+    traces = data.extract_rois(labels)
+    assert allclose(traces.toarray(), [arr[:, labels == 1].mean(axis=1), arr[:, labels == 2].mean(axis=1)])
+
+
+def test_downsample(tmpdir, budget, eng):
+    arr = arange(6 * 4 * 4).reshape(6, 4, 4)
+    data = images.fromarray(ondisk(tmpdir, arr))
+    binned = data.downsample(2, time=3)
+    assert allclose(binned.toarray(), arr.reshape(2, 3, 2, 2, 2, 2).mean(axis=(1, 3, 5)))
+    assert allclose(data.subsample(2).toarray(), arr[:, ::2, ::2])
+
+
+def test_downsample_time_uneven(tmpdir, eng):
+    arr = arange(7 * 4 * 4).reshape(7, 4, 4)
+    data = images.fromarray(ondisk(tmpdir, arr))
+    binned = data.downsample(2, time=2)
+    assert binned.shape == (3, 2, 2)
+    assert allclose(binned.toarray(), arr[:6].reshape(3, 2, 2, 2, 2, 2).mean(axis=(1, 3, 5)))
@@ -0,0 +1,149 @@
+import pytest
+import os
+from operator import add, neg
+from numpy import allclose, arange, array, any, random
+
+from thunder import images, series
+from thunder.executors import LocalExecutor, ProcessExecutor, ThreadExecutor, \
+    get_executor, set_executor, use_executor
+
+resources = os.path.join(os.path.dirname(os.path.realpath(__file__)), 'resources')
+
+
+@pytest.fixture(scope='module')
+def executor():
+    executor = ProcessExecutor(workers=2)
+    yield executor
+    executor.shutdown()
+
+
+def test_executor_map(executor):
+    assert list(executor.map(neg, range(10))) == [-x for x in range(10)]
+    assert list(executor.map(neg, [])) == []
+
+
+def test_executor_reduce(executor):
+    assert executor.reduce(add, range(10)) == 45
+    assert executor.reduce(add, [1]) == 1
+    with pytest.raises(TypeError):
+        executor.reduce(add, [])
+
+
+def test_executor_reduce_tree(executor):
+    for fanin in [2, 3, 16]:
+        assert executor.reduce(add, range(10), fanin=fanin) == 45
+        assert executor.reduce(add, [1], fanin=fanin) == 1
+    assert LocalExecutor().reduce(add, range(10), fanin=2) == 45
+    with pytest.raises(ValueError):
+        executor.reduce(add, range(10), fanin=1)
+    with pytest.raises(TypeError):
+        executor.reduce(add, [], fanin=2)
+
+
+def test_map(executor):
+    original = arange(24).reshape(2, 3, 4)
+    data = series.fromarray(original, engine=executor)
+    assert data.executor is executor
+    mapped = data.map(neg)
+    assert mapped.executor is executor
+    assert allclose(mapped.toarray(), -original)
+    mapped = data.map(neg, batch=2)
+    assert allclose(mapped.toarray(), -original)
+
+
+def test_filter(executor):
+    data = images.fromlist([array([[0, 0]]), array([[1, 0]]), array([[0, 2]])],
+                           labels=[0, 1, 2], engine=executor)
+    filtered = data.filter(any)
+    assert allclose(filtered.toarray(), [[1, 0], [0, 2]])
+    assert allclose(filtered.labels, [1, 2])
+
+
+def test_reduce(executor):
+    data = series.fromlist([arange(4) * i for i in range(10)], engine=executor)
+    assert allclose(data.reduce(add).toarray(), arange(4) * 45)
+    assert allclose(data.reduce(add, fanin=2).toarray(), arange(4) * 45)
+
+
+def test_conversions(executor):
+    data = images.fromarray(arange(24).reshape(2, 3, 4), engine=executor)
+    assert data.toseries().executor is executor
+    assert data.toseries().toimages().executor is executor
+    assert data.toblocks().executor is executor
+    blocks = data.toblocks((1, 4)).map(neg)
+    assert allclose(blocks.toimages().toarray(), -data.toarray())
+    assert blocks.toimages().executor is executor
+
+
+def test_closures(executor):
+    data = series.fromarray(arange(12).reshape(3, 4), engine=executor)
+    offset = 2
+    assert allclose(data.map(lambda x: x + offset).toarray(), arange(12).reshape(3, 4) + 2)
+    assert allclose(data.filter(lambda x: x[0] > 0).toarray(), arange(4, 12).reshape(2, 4))
+
+
+def test_pool_abstract():
+    from thunder.executors import PoolExecutor
+    with pytest.raises(TypeError):
+        PoolExecutor(workers=2)
+
+
+def test_executor_setting():
+    data = series.fromarray(arange(12).reshape(3, 4))
+    assert data.executor is None
+    data.executor = LocalExecutor()
+    assert allclose(data.map(neg).toarray(), -arange(12).reshape(3, 4))
+    with pytest.raises(ValueError):
+        data.executor = 'executor'
+
+
+def test_threads():
+    with ThreadExecutor(workers=3) as executor:
+        data = images.fromarray(random.randn(10, 8, 8), engine=executor)
+        assert allclose(data.gaussian_filter(1).toarray(),
+                        images.fromarray(data.toarray()).gaussian_filter(1).toarray())
+        assert allclose(data.map(lambda x: x.sum()).toarray(), data.toarray().sum(axis=(1, 2)))
+        assert data.filter(lambda x: x[0, 0] > 0).shape[0] == (data.toarray()[:, 0, 0] > 0).sum()
+        assert allclose(data.reduce(lambda x, y: x + y).toarray(), data.toarray().sum(axis=0))
+
+
+def test_threads_bounded():
+    from thunder.disk import set_memory_budget
+    calls = []
+    items = arange(1000.0)[:, None]
+    set_memory_budget(64)
+    try:
+        with ThreadExecutor(workers=2, chunks=1) as executor:
+            results = executor.map(lambda x: calls.append(x) or -x, items)
+            assert allclose(next(results), 0)
+            assert len(calls) <= 8
+            assert allclose(list(results), -items[1:])
+            assert len(calls) == 1000
+            assert executor.reduce(add, items) == 499500
+    finally:
+        set_memory_budget()
+
+
+def test_threads_reader():
+    path = os.path.join(resources, 'singlelayer_tif', '*.tif')
+    with ThreadExecutor(workers=2) as executor:
+        data = images.fromtif(path, engine=executor)
+        assert data.executor is executor
+        assert allclose(data.toarray(), images.fromtif(path).toarray())
+
+
+def test_default_executor():
+    executor = ThreadExecutor(workers=2)
+    assert type(get_executor()) is LocalExecutor
+    with use_executor(executor):
+        assert get_executor() is executor
+        data = series.fromarray(arange(12).reshape(3, 4))
+        assert allclose(data.map(lambda x: x * 2).toarray(), arange(12).reshape(3, 4) * 2)
+    assert get_executor() is not executor
+    set_executor(executor)
+    assert get_executor() is executor
+    set_executor()
+    assert type(get_executor()) is LocalExecutor
+    with pytest.raises(ValueError):
+        set_executor('executor')
+    executor.shutdown()
@@ -98,6 +98,35 @@ def test_subsample(eng):
     assert allclose(vals, truth)
 
 
+def test_subsample_view(eng):
+    from numpy import may_share_memory
+    x = arange(3 * 4 * 6).reshape((3, 4, 6))
+    data = fromarray(x, engine=eng)
+    assert allclose(data.subsample((2, 3)).toarray(), x[:, ::2, ::3])
+    if eng is None:
+        assert may_share_memory(data.subsample(2).values, data.values)
+
+
+def test_downsample(eng):
+    x = arange(5 * 4 * 7).reshape((5, 4, 7)).astype('float64')
+    data = fromarray(x, engine=eng)
+    vals = data.downsample(2).toarray()
+    assert allclose(vals, x[:, :4, :6].reshape(5, 2, 2, 3, 2).mean(axis=(2, 4)))
+    vals = data.downsample((1, 3), time=2).toarray()
+    assert allclose(vals, x[:4, :, :6].reshape(2, 2, 4, 2, 3).mean(axis=(1, 4)))
+    with pytest.raises(ValueError):
+        data.downsample(0)
+
+
+def test_downsample_time_uneven(eng):
+    x = arange(7 * 4 * 4).reshape((7, 4, 4)).astype('float64')
+    truth = x[:6].reshape(3, 2, 2, 2, 2, 2).mean(axis=(1, 3, 5))
+    data = fromarray(x, engine=eng)
+    assert allclose(data.downsample(2, time=2).toarray(), truth)
+    if eng is None:
+        assert allclose(data.lazy().downsample(2, time=2).toarray(), truth)
+
+
 def test_median_filter_2d(eng):
     data = fromlist([arange(24).reshape((4, 6))], engine=eng)
     assert data.median_filter(2).toarray().shape == (4, 6)
@@ -173,6 +202,16 @@ def test_var(eng):
     assert allclose(data.var().toarray(), original.var(axis=0))
 
 
+def test_stats(eng):
+    original = arange(60).reshape((5, 3, 4)) % 7
+    data = fromlist(list(original), engine=eng)
+    stats = data.stats()
+    assert stats['count'] == 5
+    for name in ['sum', 'mean', 'var', 'std', 'min', 'max']:
+        assert allclose(stats[name].shape, (1, 3, 4))
+        assert allclose(stats[name].toarray(), getattr(original, name)(axis=0))
+
+
 def test_subtract(eng):
     original = arange(24).reshape((4, 6))
     data = fromlist([original], engine=eng)
@@ -223,3 +262,24 @@ def test_reshape_values(eng):
     # cannot create images with more than 3 dimensions
     with pytest.raises(ValueError):
         original.reshape(2, 2, 2, 3, 3)
+
+
+def test_extract_rois(eng):
+    from numpy import random, zeros
+    from scipy.sparse import csr_matrix
+    x = random.RandomState(0).randn(5, 4, 6)
+    data = fromarray(x, engine=eng)
+    labels = zeros((4, 6), dtype='int')
+    labels[:2, :3] = 3
+    labels[2:, 3:] = 7
+    traces = data.extract_rois(labels)
+    assert isinstance(traces, Series)
+    assert traces.shape == (2, 5)
+    assert allclose(traces.labels, [3, 7])
+    assert allclose(traces.toarray(), [x[:, :2, :3].mean(axis=(1, 2)), x[:, 2:, 3:].mean(axis=(1, 2))])
+    weights = random.RandomState(1).rand(3, 4, 6)
+    expected = [(x * w).sum(axis=(1, 2)) / w.sum() for w in weights]
+    assert allclose(data.extract_rois(weights).toarray(), expected)
+    assert allclose(data.extract_rois(csr_matrix(weights.reshape(3, -1))).toarray(), expected)
+    with pytest.raises(ValueError):
+        data.extract_rois(zeros((3, 3)))
@@ -0,0 +1,27 @@
+import os
+import sys
+import subprocess
+
+root = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+
+optional = ['pyspark', 'bolt', 'boto', 'scipy', 'tifffile', 'PIL']
+
+
+def imported_after(code):
+    check = "import sys; print(','.join(m for m in %r if m in sys.modules))" % optional
+    output = subprocess.check_output([sys.executable, '-c', code + '\n' + check], cwd=root)
+    return [m for m in output.decode().strip().split(',') if m]
+
+
+def test_import():
+    assert imported_after('import thunder') == []
+
+
+def test_local_operations():
+    code = '\n'.join([
+        'import numpy, thunder',
+        'data = thunder.images.fromarray(numpy.ones((2, 3, 4)))',
+        'data.map(lambda x: x + 1).toseries().center().toimages().toblocks().toimages().toarray()',
+        'data.mean().toarray()'
+    ])
+    assert imported_after(code) == []
@@ -0,0 +1,54 @@
+import json
+import pytest
+from numpy import arange
+
+from thunder import images, series, profile
+
+pytestmark = pytest.mark.usefixtures("eng")
+
+
+def test_profile(eng):
+    arr = arange(2 * 3 * 4).reshape(2, 3, 4)
+    with profile() as report:
+        data = images.fromarray(arr, engine=eng)
+        data.map(lambda x: x * 2).toseries().toarray()
+    names = [call['name'] for call in report.calls]
+    assert names[0] == 'images.fromarray'
+    assert 'Images.map' in names
+    assert 'Images.toseries' in names
+    call = report.calls[names.index('Images.map')]
+    assert call['records_in'] == 2
+    assert call['records_out'] == 2
+    assert call['bytes_in'] == arr.nbytes
+    assert call['time'] >= 0
+
+
+def test_profile_nested(eng):
+    data = series.fromarray(arange(6).reshape(2, 3), engine=eng)
+    with profile() as report:
+        data.filter(lambda x: x.sum() > 3)
+    calls = dict((call['name'], call) for call in report.calls)
+    assert calls['Series.filter']['depth'] == 0
+    assert calls['Series.filter']['records_in'] == 2
+    assert calls['Series.filter']['records_out'] == 1
+
+
+def test_profile_inactive(eng):
+    data = series.fromarray(arange(6).reshape(2, 3), engine=eng)
+    with profile() as report:
+        pass
+    data.map(lambda x: x + 1)
+    assert report.calls == []
+
+
+def test_profile_json(tmpdir, eng):
+    data = series.fromarray(arange(6).reshape(2, 3), engine=eng)
+    with profile() as report:
+        data.map(lambda x: x + 1)
+        data.map(lambda x: x + 1)
+    path = str(tmpdir.join('profile.json'))
+    report.tojson(path)
+    with open(path) as f:
+        loaded = json.load(f)
+    assert loaded['summary']['Series.map']['calls'] == 2
+    assert len(loaded['calls']) == 2
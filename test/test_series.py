@@ -1,5 +1,6 @@
 import pytest
-from numpy import allclose, arange, array, asarray, dot, cov, corrcoef, float64
+from numpy import allclose, arange, array, asarray, dot, cov, corrcoef, float64, random, roll
+from numpy.linalg import norm
 
 from thunder.series.readers import fromlist, fromarray
 from thunder.images.readers import fromlist as img_fromlist
@@ -44,6 +45,37 @@ def test_between(eng):
     assert allclose(val.toarray(), array([[4, 5], [8, 9]]))
 
 
+def test_select_positions(eng):
+    from numpy import may_share_memory
+    x = arange(2 * 3 * 8).reshape(2, 3, 8)
+    data = fromarray(x, index=array([5, 1, 3, 7, 9, 2, 4, 6]), engine=eng)
+    assert allclose(data.between(2, 6).toarray(), x[:, :, [0, 2, 5, 6]])
+    assert allclose(data.between(2, 6).index, [5, 3, 2, 4])
+    assert allclose(data.select([1, 9, 4]).toarray(), x[:, :, [1, 4, 6]])
+    assert allclose(data.select(lambda i: i > 6).index, [7, 9])
+    assert data.select(9).shape == (2, 3, 1)
+    data = fromarray(x, index=arange(8) * 10, engine=eng)
+    selected = data.between(20, 50)
+    assert allclose(selected.toarray(), x[:, :, 2:5])
+    assert allclose(selected.index, [20, 30, 40])
+    if eng is None:
+        assert may_share_memory(selected.values, data.values)
+    with pytest.raises(Exception):
+        data.between(100, 200)
+
+
+def test_subsample_downsample(eng):
+    from numpy import may_share_memory
+    x = arange(2 * 3 * 9).reshape(2, 3, 9)
+    data = fromarray(x, engine=eng)
+    assert allclose(data.subsample(3).toarray(), x[:, :, ::3])
+    assert allclose(data.subsample(3).index, [0, 3, 6])
+    assert allclose(data.downsample(2).toarray(), x[:, :, :8].reshape(2, 3, 4, 2).mean(axis=3))
+    assert allclose(data.downsample(2).index, arange(4))
+    if eng is None:
+        assert may_share_memory(data.subsample(3).values, data.values)
+
+
 def test_first(eng):
     data = fromlist([array([4, 5, 6, 7]), array([8, 9, 10, 11])], engine=eng)
     assert allclose(data.first(), [4, 5, 6, 7])
@@ -92,6 +124,68 @@ def test_squelch(eng):
     assert allclose(squelched.toarray(), [[1, 2], [3, 4]])
 
 
+def test_transform_inplace(eng):
+    x = random.RandomState(0).randn(2, 3, 10)
+    if eng is None:
+        data = fromarray(x.copy())
+        assert data.zscore(1, inplace=True) is data
+        assert allclose(data.toarray(), (x - x.mean(axis=2)[:, :, None]) / x.std(axis=2)[:, :, None])
+        data = fromarray(x.copy())
+        data.center(0, inplace=True)
+        assert allclose(data.toarray(), x - x.mean(axis=(0, 1)))
+        data = fromarray(x.copy())
+        data.squelch(1.5, inplace=True)
+        assert allclose(data.toarray(), x * (x.max(axis=2) >= 1.5)[:, :, None])
+        with pytest.raises(ValueError):
+            fromarray(arange(10).reshape(2, 5)).center(inplace=True)
+        data = fromarray(x.tolist())
+        values = data.values
+        data.center(inplace=True)
+        assert data.values is values
+        assert allclose(values, x - x.mean(axis=2)[:, :, None])
+    data = fromarray(x, engine=eng)
+    assert allclose(data.standardize(1).toarray(), x / x.std(axis=2)[:, :, None])
+
+
+def test_transform_inplace_shared(eng):
+    if eng is not None:
+        return
+    x = random.RandomState(0).randn(4, 10)
+    centered = x - x.mean(axis=1)[:, None]
+    y = x.copy()
+    data = fromarray(y)
+    data.center(inplace=True)
+    assert data.values is y
+    assert allclose(y, centered)
+    data = fromarray(x).map(lambda v: v + 0)
+    values = data.values
+    data.center(inplace=True)
+    assert data.values is values
+    assert allclose(values, centered)
+    data = fromarray(x.copy())
+    part = data.between(2, 8)
+    part.center(inplace=True)
+    assert allclose(data.toarray(), x)
+    assert allclose(part.toarray(), x[:, 2:8] - x[:, 2:8].mean(axis=1)[:, None])
+    y = x.copy()
+    y.flags.writeable = False
+    with pytest.raises(ValueError):
+        fromarray(y).center(inplace=True)
+
+
+def test_transform_inplace_derived(eng):
+    if eng is not None:
+        return
+    x = random.RandomState(0).randn(2, 2, 10)
+    zscored = (x - x.mean(axis=2)[:, :, None]) / x.std(axis=2)[:, :, None]
+    data = fromarray(x.copy())
+    images = data.toimages()
+    part = data.between(2, 8)
+    data.zscore(inplace=True)
+    assert allclose(images.toarray(), zscored.transpose(2, 0, 1))
+    assert allclose(part.toarray(), zscored[:, :, 2:8])
+
+
 def test_correlate(eng):
     data = fromlist([array([1, 2, 3, 4, 5])], engine=eng)
     sig = [4, 5, 6, 7, 8]
@@ -102,6 +196,15 @@ def test_correlate(eng):
     assert allclose(corrs, [1, -1])
 
 
+def test_correlate_random(eng):
+    x = random.RandomState(0).randn(2, 3, 20)
+    sigs = random.RandomState(1).randn(4, 20)
+    data = fromarray(x, engine=eng)
+    expected = [[[corrcoef(r, s)[0, 1] for s in sigs] for r in row] for row in x]
+    assert allclose(data.correlate(sigs).toarray(), expected)
+    assert allclose(data.correlate(sigs[0]).toarray(), asarray(expected)[:, :, 0])
+
+
 def test_correlate_multiindex(eng):
     index = [[0, 1, 2, 3, 4], [5, 6, 7, 8, 9]]
     data = fromlist([array([1, 2, 3, 4, 5])], index=asarray(index).T, engine=eng)
@@ -164,6 +267,35 @@ def test_min(eng):
     expected = data.toarray().min(axis=0)
     assert allclose(val, expected)
 
+def test_stats(eng):
+    original = arange(24).reshape(2, 3, 4) % 5 * 1.5
+    data = fromarray(original, engine=eng)
+    stats = data.stats()
+    assert stats['count'] == 6
+    for name in ['sum', 'mean', 'var', 'std', 'min', 'max']:
+        assert allclose(stats[name].shape, (1, 1, 4))
+        assert allclose(stats[name].toarray(), getattr(original, name)(axis=(0, 1)))
+    assert str(stats['mean'].dtype) == 'float64'
+
+
+def test_stats_blocks(eng):
+    from thunder import set_memory_budget
+    from thunder.stats import Summary
+    original = random.RandomState(0).randn(10, 3, 4)
+    data = fromarray(original, engine=eng)
+    set_memory_budget(300)
+    try:
+        stats = data.stats()
+    finally:
+        set_memory_budget()
+    for name in ['sum', 'mean', 'var', 'std', 'min', 'max']:
+        assert allclose(stats[name].toarray(), getattr(original, name)(axis=(0, 1)))
+    empty = Summary.of(original[:0], axis=(0, 1))
+    assert empty.count == 0
+    with pytest.raises(ValueError):
+        empty.mean
+
+
 def test_labels(eng):
     x = [array([0, 1]), array([2, 3]), array([4, 5]), array([6, 7])]
     data = fromlist(x, labels=[0, 1, 2, 3], engine=eng)
@@ -234,6 +366,21 @@ def test_select_by_index(eng):
     assert allclose(result.index, array([[0, 0, 0], [0, 0, 1], [1, 0, 0], [1, 0, 1]]))
 
 
+def test_groups_by_index(eng):
+    index = array([[1, 1, 0, 0, 1, 1], [5, 3, 5, 3, 5, 9]]).T
+    data = fromlist([arange(6)], index=index, engine=eng)
+    codes, keys, order, starts = data._groups(level=[0, 1])
+    assert allclose(codes, [3, 2, 1, 0, 3, 4])
+    assert allclose(keys, [[0, 3], [0, 5], [1, 3], [1, 5], [1, 9]])
+    assert allclose(order, [3, 2, 1, 0, 4, 5])
+    assert allclose(starts, [0, 1, 2, 3, 5])
+    assert data._groups(level=[0, 1]) is data._groups(level=[0, 1])
+    result = data.aggregate_by_index(sum, level=[0, 1])
+    assert allclose(result.toarray(), [3, 2, 1, 4, 5])
+    data.index = arange(6)
+    assert len(data._groups(level=0)[1]) == 6
+
+
 def test_aggregate_by_index(eng):
     data = fromlist([arange(12)], index=[0, 0, 0, 0, 1, 1, 1, 1, 2, 2, 2, 2], engine=eng)
     result = data.aggregate_by_index(sum)
@@ -266,6 +413,55 @@ def test_stat_by_index(eng):
     assert allclose(data.median_by_index().toarray(), array([1.5, 5.5, 9.5]))
 
 
+def test_stat_by_index_random(eng):
+    from numpy import sum, mean, std, min, max, size
+    x = random.RandomState(0).randn(3, 40).astype('float32')
+    index = random.RandomState(1).randint(0, 3, size=(40, 2))
+    data = fromarray(x, index=index, engine=eng)
+    for stat, func in [('sum', sum), ('mean', mean), ('stdev', std), ('min', min), ('max', max), ('count', size)]:
+        result = data.stat_by_index(stat, level=[0, 1])
+        expected = data.aggregate_by_index(func, level=[0, 1])
+        assert allclose(result.toarray(), expected.toarray(), atol=1e-5)
+        assert allclose(result.index, expected.index)
+        assert result.dtype == expected.dtype
+
+
+def test_stat_by_label(eng):
+    x = random.RandomState(0).randn(4, 5, 6)
+    labels = random.RandomState(1).randint(0, 3, size=(4, 5))
+    data = fromarray(x, labels=labels, engine=eng)
+    for stat, name in [('sum', 'sum'), ('mean', 'mean'), ('stdev', 'std'), ('min', 'min'), ('max', 'max')]:
+        result = data.stat_by_label(stat)
+        expected = [getattr(x[labels == label], name)(axis=0) for label in [0, 1, 2]]
+        assert allclose(result.toarray(), expected)
+        assert allclose(result.labels, [0, 1, 2])
+        assert allclose(result.index, data.index)
+    assert allclose(data.count_by_label().toarray()[:, 0], [(labels == label).sum() for label in [0, 1, 2]])
+    assert allclose(data.mean_by_label().toarray(), data.stat_by_label('mean').toarray())
+    with pytest.raises(ValueError):
+        fromarray(x, engine=eng).mean_by_label()
+
+
+def test_stat_by_label_blocks(eng):
+    from thunder import set_memory_budget
+    x = random.RandomState(0).randn(40, 6)
+    labels = random.RandomState(1).randint(0, 5, size=40)
+    data = fromarray(x, labels=labels, engine=eng)
+    set_memory_budget(200)
+    try:
+        result = data.stat_by_label('stdev')
+    finally:
+        set_memory_budget()
+    assert allclose(result.toarray(), [x[labels == label].std(axis=0) for label in range(5)])
+
+
+def test_stat_by_label_integers(eng):
+    x = array([[60000, 1], [60000, 2], [3, 4]], dtype='uint16')
+    data = fromarray(x, labels=[0, 0, 1], engine=eng)
+    assert allclose(data.stat_by_label('sum').toarray(), [[120000, 3], [3, 4]])
+    assert allclose(data.stat_by_label('mean').toarray(), [[60000, 1.5], [3, 4]])
+
+
 def test_stat_by_index_multi(eng):
     index = [
         [0, 0, 0, 0, 0, 0, 1, 1, 1, 1, 1, 1],
@@ -354,6 +550,19 @@ def test_fourier(eng):
     assert allclose(vals.select('phase').toarray(), 4.102501)
 
 
+def test_fourier_many(eng):
+    x = random.RandomState(0).randn(3, 20)
+    data = fromarray(x, engine=eng)
+    single = [data.fourier(freq=f).toarray() for f in [1, 4, 7]]
+    vals = data.fourier(freq=[1, 4, 7])
+    assert allclose(vals.select('coherence').toarray(), array([v[:, 0] for v in single]).T)
+    assert allclose(vals.select('phase').toarray(), array([v[:, 1] for v in single]).T)
+    spectrum = data.fourier()
+    assert spectrum.shape == (3, 20)
+    assert allclose(spectrum.select('coherence').toarray()[:, [1, 4, 7]], array([v[:, 0] for v in single]).T)
+    assert allclose((spectrum.select('coherence').toarray()[:, 1:] ** 2).sum(axis=1), 1)
+
+
 def test_convolve(eng):
     data = fromlist([array([1, 2, 3, 4, 5])], engine=eng)
     sig = array([1, 2, 3])
@@ -361,6 +570,22 @@ def test_convolve(eng):
     assert allclose(betas.toarray(), array([4, 10, 16, 22, 22]))
 
 
+def test_convolve_batched(eng):
+    from numpy import convolve
+    x = random.RandomState(0).randn(3, 40)
+    data = fromarray(x, engine=eng)
+    for m in [3, 30, 60]:
+        sig = random.RandomState(1).randn(m)
+        for mode in ['full', 'same', 'valid']:
+            result = data.convolve(sig, mode=mode)
+            expected = [convolve(y, sig, mode) for y in x]
+            assert allclose(result.toarray(), expected)
+            assert allclose(result.index, arange(len(expected[0])))
+    ints = fromarray(arange(80).reshape(2, 40), engine=eng).convolve(arange(50), mode='same')
+    assert ints.dtype == arange(1).dtype
+    assert allclose(ints.toarray(), [convolve(y, arange(50), 'same') for y in arange(80).reshape(2, 40)])
+
+
 def test_crosscorr(eng):
     local = array([1.0, 2.0, -4.0, 5.0, 8.0, 3.0, 4.1, 0.9, 2.3])
     data = fromlist([local], engine=eng)
@@ -372,12 +597,38 @@ def test_crosscorr(eng):
     assert allclose(betas.toarray(), truth, atol=1E-5)
 
 
+def test_crosscorr_lags(eng):
+    x = random.RandomState(0).randn(3, 50)
+    sig = random.RandomState(1).randn(50)
+    data = fromarray(x, engine=eng)
+    s = (sig - sig.mean()) / norm(sig - sig.mean())
+    y = (x - x.mean(axis=1)[:, None]) / norm(x - x.mean(axis=1)[:, None], axis=1)[:, None]
+    for lag in [3, 40]:
+        lagged = [roll(s, k) * ((arange(50) >= k) & (arange(50) < 50 + k)) for k in range(-lag, lag + 1)]
+        betas = data.crosscorr(signal=sig, lag=lag)
+        assert allclose(betas.toarray(), dot(y, array(lagged).T))
+        assert allclose(betas.index, arange(-lag, lag + 1))
+
+
 def test_detrend(eng):
     data = fromlist([array([1, 2, 3, 4, 5])], engine=eng)
     out = data.detrend('linear')
     assert(allclose(out.toarray(), array([1, 1, 1, 1, 1])))
 
 
+def test_detrend_nonlinear(eng):
+    from numpy import polyfit, polyval
+    x = random.RandomState(0).randn(4, 30) + arange(30) ** 2 * 0.01
+    data = fromarray(x, engine=eng)
+    for method, order in [('linear', 1), ('nonlinear', 3)]:
+        expected = []
+        for y in x:
+            p = polyfit(arange(30), y, order)
+            p[-1] = 0
+            expected.append(y - polyval(p, arange(30)))
+        assert allclose(data.detrend(method, order=order).toarray(), expected)
+
+
 def test_normalize_percentile(eng):
     data = fromlist([array([1, 2, 3, 4, 5])], engine=eng)
     out = data.normalize('percentile', perc=20)
@@ -412,6 +663,39 @@ def test_normalize_window_exact(eng):
     assert allclose(vals, result_true, atol=1e-3)
 
 
+def test_normalize_window_sliding(eng):
+    from numpy import percentile
+    x = random.RandomState(0).randn(3, 300)
+    x[0] = 1
+    data = fromarray(x, engine=eng)
+    for window in [3, 10, 150]:
+        left, right = (window // 2 + 1, window // 2 + 2) if window % 2 else (window // 2, window // 2)
+        b = array([[percentile(y[max(ix - left, 0):ix + right + 1], 20) for ix in range(300)] for y in x])
+        vals = data.normalize('window-exact', window=window).toarray()
+        assert allclose(vals, (x - b) / (b + 0.1))
+        approx = data.normalize('window-approx', window=window, bins=50, offset=10).toarray()
+        bound = (x.max(axis=1) - x.min(axis=1))[:, None] / 100
+        assert (abs((x - approx * 10) / (1 + approx) - b) <= bound + 1e-8).all()
+    exact = data.normalize('window-exact', window=10).toarray()
+    assert allclose(data.normalize('window-approx', window=10, bins=50).toarray(), exact)
+
+
+def test_normalize_window_nan(eng):
+    from numpy import percentile, isnan, nan
+    x = random.RandomState(0).randn(3, 200)
+    x[1, 5] = nan
+    x[2] = nan
+    data = fromarray(x, engine=eng)
+    for window in [4, 150]:
+        left, right = (window // 2 + 1, window // 2 + 2) if window % 2 else (window // 2, window // 2)
+        b = array([[percentile(y[max(ix - left, 0):ix + right + 1], 20) for ix in range(200)] for y in x])
+        vals = data.normalize('window-exact', window=window).toarray()
+        assert (isnan(vals) == isnan(b)).all()
+        assert allclose(vals[~isnan(b)], ((x - b) / (b + 0.1))[~isnan(b)])
+        approx = data.normalize('window-approx', window=window).toarray()
+        assert (isnan(approx) == isnan(b)).all()
+
+
 def test_normalize_mean(eng):
     data = fromlist([array([1, 2, 3, 4, 5])], engine=eng)
     vals = data.normalize('mean').toarray()
@@ -430,6 +714,23 @@ def test_mean_by_window(eng):
     assert allclose(test4, [1, 2, 3, 4])
 
 
+def test_mean_by_window_stack(eng):
+    x = random.RandomState(0).randn(2, 3, 30)
+    data = fromarray(x, index=arange(30) * 2, engine=eng)
+    centers = [10, 20, 40, 20]
+    positions = [5, 10, 20, 10]
+    stacked = data.mean_by_window(indices=centers, window=5, stack=True)
+    expected = array([x[:, :, p - 2:p + 3] for p in positions]).transpose(1, 2, 0, 3)
+    assert stacked.shape == (2, 3, 4, 5)
+    assert allclose(stacked.toarray(), expected)
+    assert allclose(stacked.index, arange(5))
+    assert allclose(data.mean_by_window(indices=centers, window=5).toarray(), expected.mean(axis=2))
+    with pytest.raises(ValueError):
+        data.mean_by_window(indices=[11], window=5)
+    with pytest.raises(ValueError):
+        data.mean_by_window(indices=[56], window=5)
+
+
 def test_reshape(eng):
     original =  fromarray(arange(72).reshape(6, 6, 2), engine=eng)
     arr = original.toarray()
@@ -1,5 +1,9 @@
 from . import series
 from . import images
+from .executors import LocalExecutor, ProcessExecutor, ThreadExecutor, \
+    set_executor, use_executor
+from .disk import set_memory_budget, set_scratch
+from .profiling import profile
 
 def _setup():
     import logging
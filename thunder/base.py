@@ -1,13 +1,11 @@
 from numpy import array, asarray, ndarray, prod, ufunc, add, subtract, \
-    multiply, divide, isscalar, newaxis, unravel_index, dtype
-from bolt.utils import inshape, tupleize, slicify
-from bolt.base import BoltArray
-from bolt.spark.array import BoltArraySpark
-from bolt.spark.chunk import ChunkedArray
-from functools import reduce
-
-
-from .utils import notsupported
+    multiply, divide, isscalar, newaxis, unravel_index, dtype, arange, \
+    empty, can_cast, promote_types, fromiter
+from .utils import notsupported, isbolt, inshape, tupleize, slicify
+from .executors import LocalExecutor, get_executor
+from .disk import isdisk, iterblocks, allocate, compress, summarize
+from .stats import Summary
+from .profiling import profiled
 
 class Base(object):
     """
@@ -20,11 +18,13 @@ class Base(object):
     Handles construction, metadata, and backend specific methods.
     """
     _metadata = ['dtype', 'shape', 'mode']
-    _attributes = []
+    _attributes = ['executor', '_lazy']
 
     def __init__(self, values, mode='local'):
         self._values = values
-        if isinstance(values, BoltArray) or isinstance(values, ChunkedArray):
+        self._executor = None
+        self._lazy = False
+        if isbolt(values):
             mode = 'spark'
         if isinstance(values, ndarray):
             mode = 'local'
@@ -59,7 +59,7 @@ class Base(object):
         noprop : iterable of string attribute names, default empty tuple
             Attributes found in noprop will *not* have their values propagated forward.
         """
-        if isinstance(other, Data):
+        if isinstance(other, Base):
             for name in self._attributes:
                 if name not in noprop:
                     attr = getattr(other, name, None)
@@ -88,8 +88,20 @@ class Base(object):
 
     @property
     def values(self):
+        if isinstance(self._values, DeferredArray):
+            self._values = self._values.compute(self.executor)
         return self._values
 
+    @property
+    def executor(self):
+        return self._executor
+
+    @executor.setter
+    def executor(self, value):
+        if value is not None and not isinstance(value, LocalExecutor):
+            raise ValueError("Executor must be a LocalExecutor, got %s" % type(value))
+        self._executor = value
+
     def tordd(self):
         """
         Return an RDD for datasets backed by Spark (Spark only).
@@ -101,10 +113,15 @@ class Base(object):
 
     def compute(self):
         """
-        Force lazy computations to execute for datasets backed by Spark (Spark only).
+        Force lazy computations to execute.
+
+        For datasets backed by Spark, or for local datasets
+        with pending operations (see Data.lazy).
         """
         if self.mode == 'spark':
             self.values.tordd().count()
+        elif self._lazy:
+            self.values
         else:
             notsupported(self.mode)
 
@@ -201,7 +218,7 @@ class Data(Base):
             item = tuple([slicify(i, n) if isinstance(i, int) else i for i, n in zip(item, self.shape[:len(item)])])
         if isinstance(item, (list, ndarray)):
             item = (item,)
-        new = self._values.__getitem__(item)
+        new = self.values.__getitem__(item)
         result = self._constructor(new).__finalize__(self, noprop=('index', 'labels'))
 
         # handle labels
@@ -278,6 +295,26 @@ class Data(Base):
         """
         return asarray(self.values).squeeze()
 
+    def lazy(self):
+        """
+        Defer computations until their results are needed (local only).
+
+        Returns new data, leaving the original unchanged, on which map
+        operations (including element-wise operations and the many methods
+        built on map) are recorded instead of applied, and which propagate
+        to derived data. Consecutive maps are fused, so each record passes
+        through the whole chain in a single pass over the data, without
+        allocating intermediate arrays. Pending operations are executed
+        when values are needed, e.g. by toarray, compute, filter, a reduction,
+        a conversion, or a write.
+        """
+        if self.mode == 'local':
+            new = self._constructor(self._values).__finalize__(self)
+            new._lazy = True
+            return new
+        else:
+            notsupported(self.mode)
+
     def tospark(self):
         """
         Convert data to Spark.
@@ -338,6 +375,33 @@ class Data(Base):
         """
         raise NotImplementedError
 
+    def stats(self):
+        """
+        Compute several statistics along the appropriate dimension in one pass.
+
+        Returns a dict with the number of records ('count'), and data
+        for the 'sum', 'mean', 'var', 'std', 'min', and 'max', matching
+        the results of the corresponding methods. Summaries of blocks
+        (local) or partitions (spark) are merged, so each record
+        is only read once.
+        """
+        if self.mode == 'local' and isdisk(self.values):
+            summary = summarize(self._align(self.baseaxes))
+
+        elif self.mode == 'local':
+            summary = Summary.of(self.values, axis=self.baseaxes)
+
+        if self.mode == 'spark':
+            rdd = self.values._align(self.baseaxes).tordd().values()
+            summary = rdd.mapPartitions(lambda records: [Summary(records)])\
+                         .treeReduce(lambda left, right: left.combine(right), depth=3)
+
+        shape = (1,) * len(self.baseaxes) + self.value_shape
+        result = {'count': summary.count}
+        for name in ['sum', 'mean', 'var', 'std', 'min', 'max']:
+            result[name] = self._constructor(asarray(getattr(summary, name)).reshape(shape))
+        return result
+
     def _align(self, axes, key_shape=None):
         """
         Align local arrays so that axes for iteration are in the keys.
@@ -369,6 +433,7 @@ class Data(Base):
 
         return reshaped
 
+    @profiled()
     def filter(self, func):
         """
         Filter array along an axis.
@@ -386,10 +451,11 @@ class Data(Base):
 
         if self.mode == 'local':
             reshaped = self._align(self.baseaxes)
-            filtered = asarray(list(filter(func, reshaped)))
-
-            if self.labels is not None:
-                mask = asarray(list(map(func, reshaped)))
+            executor = get_executor(self.executor)
+            mask = empty(reshaped.shape[0], dtype=bool)
+            for s, block in iterblocks(reshaped):
+                mask[s] = fromiter(executor.map(func, block), bool, s.stop - s.start)
+            filtered = compress(mask, reshaped) if isdisk(reshaped) else reshaped[mask]
 
         if self.mode == 'spark':
 
@@ -409,7 +475,8 @@ class Data(Base):
 
         return self._constructor(filtered, labels=newlabels).__finalize__(self, noprop=('labels',))
 
-    def map(self, func, value_shape=None, dtype=None, with_keys=False):
+    @profiled()
+    def map(self, func, value_shape=None, dtype=None, with_keys=False, batch=False):
         """
         Apply an array -> array function across an axis.
 
@@ -426,49 +493,222 @@ class Data(Base):
             Axis or multiple axes to apply function along.
 
         value_shape : tuple, optional, default=None
-            Known shape of values resulting from operation. Only
-            valid in spark mode.
+            Known shape of values resulting from operation. In local
+            mode, if given along with dtype, the output is allocated
+            before the function is applied.
 
         dtype : numpy dtype, optional, default=None
-            Known shape of dtype resulting from operation. Only
-            valid in spark mode.
+            Known dtype of values resulting from operation. In local
+            mode, results are written into an output of this type.
 
         with_keys : bool, optional, default=False
             Include keys as an argument to the function
+
+        batch : bool or int, optional, default=False
+            Apply the function to blocks of records instead of single records.
+            The function will receive an array whose first dimension indexes
+            records, and must return an array with the same first dimension.
+            If True, all records are passed as one block; if an int, blocks
+            will contain at most that many records. If with_keys=True, keys
+            are passed as an array with one row per record. In spark mode
+            the function is applied to blocks containing a single record.
         """
         axis = self.baseaxes
 
         if self.mode == 'local':
             axes = sorted(tupleize(axis))
             key_shape = [self.shape[axis] for axis in axes]
+
+            # defer the function if keys are leading axes, fusing it with pending functions
+            if self._lazy and axes == list(range(len(axes))) and prod(key_shape) > 0:
+                source = self._values
+                if not (isinstance(source, DeferredArray) and source.pending):
+                    source = self.values
+                deferred = DeferredArray.defer(source, key_shape, func, with_keys, batch, dtype)
+                return self._constructor(deferred, mode=self.mode).__finalize__(self, noprop=('index'))
+
             reshaped = self._align(axes, key_shape=key_shape)
 
-            if with_keys:
-                keys = zip(*unravel_index(range(prod(key_shape)), key_shape))
-                mapped = asarray(list(map(func, zip(keys, reshaped))))
+            executor = get_executor(self.executor)
+            if batch:
+                results = self._map_batched(func, reshaped, key_shape, batch, with_keys, executor)
             else:
-                mapped = asarray(list(map(func, reshaped)))
+                results = self._map_records(func, reshaped, key_shape, with_keys, executor)
 
-            try:
-                elem_shape = mapped[0].shape
-            except:
-                elem_shape = (1,)
-
-            expand = list(elem_shape)
-            expand = [1] if len(expand) == 0 else expand
+            allocator = allocate if isdisk(reshaped) else empty
+            mapped = self._collect(results, reshaped.shape[0], value_shape, dtype, allocator)
 
             # invert the previous reshape operation, using the shape of the map result
-            linearized_shape_inv = key_shape + expand
+            linearized_shape_inv = key_shape + list(mapped.shape[1:])
             reordered = mapped.reshape(*linearized_shape_inv)
 
             return self._constructor(reordered, mode=self.mode).__finalize__(self, noprop=('index'))
 
         if self.mode == 'spark':
+            if batch:
+                func = self._unbatch(func, with_keys)
             expand = lambda x: array(func(x), ndmin=1)
             mapped = self.values.map(expand, axis, value_shape, dtype, with_keys)
             return self._constructor(mapped, mode=self.mode).__finalize__(self, noprop=('index',))
 
-    def _reduce(self, func, axis=0):
+    @staticmethod
+    def _map_records(func, reshaped, key_shape, with_keys=False, executor=None):
+        """
+        Apply a function to each linearized record.
+
+        Yields pairs of record positions and results. Records
+        stored on disk are read in blocks within the memory budget.
+        """
+        executor = get_executor(executor)
+        for s, block in iterblocks(reshaped):
+            if with_keys:
+                keys = zip(*unravel_index(range(s.start, s.stop), key_shape))
+                items = zip(keys, block)
+            else:
+                items = block
+
+            for i, result in enumerate(executor.map(func, items), s.start):
+                yield i, asarray(result)
+
+    @staticmethod
+    def _map_batched(func, reshaped, key_shape, batch, with_keys=False, executor=None):
+        """
+        Apply a function to consecutive blocks of linearized records.
+
+        Yields pairs of slices into the records and results, with
+        one row per record. Records stored on disk are read in blocks
+        within the memory budget, which also bound the size of batches.
+
+        Parameters
+        ----------
+        func : function
+            Function of a block of records (or a pair of keys and records).
+
+        reshaped : ndarray
+            Records aligned and linearized along the first dimension.
+
+        key_shape : list[int]
+            Shape of the keys before linearization.
+
+        batch : bool or int
+            If True, use a single block; if an int, maximum records per block.
+
+        executor : LocalExecutor, optional, default=None
+            Executor used to apply the function to blocks.
+        """
+        size = reshaped.shape[0] if batch is True else int(batch)
+        if size < 1:
+            raise ValueError("Batch size must be positive, got %g" % size)
+
+        executor = get_executor(executor)
+        for b, records in iterblocks(reshaped):
+            n = records.shape[0]
+            slices = [slice(start, min(start + size, n)) for start in range(0, n, size)]
+            if with_keys:
+                blocks = [(asarray(unravel_index(arange(b.start + s.start, b.start + s.stop), key_shape)).T,
+                           records[s]) for s in slices]
+            else:
+                blocks = [records[s] for s in slices]
+
+            for s, out in zip(slices, executor.map(func, blocks)):
+                yield slice(b.start + s.start, b.start + s.stop), Data._check_batch(out, s.stop - s.start)
+
+    @staticmethod
+    def _check_batch(out, n):
+        """
+        Check that the result of a batched function has one row per record.
+        """
+        out = asarray(out)
+        if out.ndim == 0 or out.shape[0] != n:
+            raise ValueError("Batched function must return an array with one "
+                             "row per record, expected %g rows" % n)
+        if out.ndim == 1:
+            out = out[:, newaxis]
+        return out
+
+    @staticmethod
+    def _collect(results, n, value_shape=None, dtype=None, allocator=empty):
+        """
+        Write mapped records into a single preallocated array.
+
+        The output is allocated once, using value_shape and dtype if both are
+        given, or otherwise the shape and dtype of the first result. Scalar
+        results are stored as records of shape (1,).
+
+        Parameters
+        ----------
+        results : iterable
+            Pairs of positions (int or slice) and results, in order.
+
+        n : int
+            Total number of records.
+
+        value_shape : tuple, optional, default=None
+            Known shape of each result.
+
+        dtype : numpy dtype, optional, default=None
+            Known dtype of the results. If not given, the output
+            will be promoted as needed to hold every result.
+
+        allocator : function, optional, default=numpy.empty
+            Function of a shape and dtype that allocates the output.
+        """
+        out = None
+        if value_shape is not None and dtype is not None:
+            out = allocator((n,) + (tupleize(value_shape) or (1,)), dtype=dtype)
+
+        # check and store results until the first single record
+        results = iter(results)
+        result = None
+        for index, result in results:
+            out = Data._store(out, index, result, n, dtype, allocator)
+            if not isinstance(index, slice):
+                break
+
+        # remaining records only need checking if they differ from the last checked record
+        if result is not None:
+            shape, kind = result.shape, result.dtype
+            for index, result in results:
+                if result.shape != shape or result.dtype != kind:
+                    out = Data._store(out, index, result, n, dtype, allocator)
+                    shape, kind = result.shape, result.dtype
+                else:
+                    out[index] = result
+
+        if out is None:
+            out = allocator((n, 1), dtype=dtype)
+
+        return out
+
+    @staticmethod
+    def _store(out, index, result, n, dtype=None, allocator=empty):
+        """
+        Store a result into the output of _collect, allocating or promoting it as needed.
+        """
+        shape = result.shape[1:] if isinstance(index, slice) else result.shape
+        shape = shape if len(shape) > 0 else (1,)
+        if out is None:
+            out = allocator((n,) + shape, dtype=result.dtype if dtype is None else dtype)
+        elif shape != out.shape[1:]:
+            raise ValueError("Map operation did not produce values of uniform shape.")
+        elif dtype is None and not can_cast(result.dtype, out.dtype):
+            promoted = allocator(out.shape, dtype=promote_types(out.dtype, result.dtype))
+            promoted[...] = out
+            out = promoted
+        out[index] = result
+        return out
+
+    @staticmethod
+    def _unbatch(func, with_keys=False):
+        """
+        Wrap a function of blocks of records as a function of a single record.
+        """
+        if with_keys:
+            return lambda kv: func((asarray([kv[0]]), kv[1][newaxis]))[0]
+        return lambda x: func(x[newaxis])[0]
+
+    @profiled()
+    def _reduce(self, func, axis=0, fanin=None):
         """
         Reduce an array along an axis.
 
@@ -484,6 +724,11 @@ class Data(Base):
 
         axis : tuple or int, optional, default=(0,)
             Axis or multiple axes to reduce along.
+
+        fanin : int, optional, default=None
+            Number of arrays combined by each task of a tree reduction
+            (local only). If None, arrays are reduced in contiguous chunks
+            by the executor, which for the serial executor is a single fold.
         """
         if self.mode == 'local':
             axes = sorted(tupleize(axis))
@@ -494,7 +739,7 @@ class Data(Base):
                 reduced = func.reduce(self, axis=tuple(axes))
             else:
                 reshaped = self._align(axes)
-                reduced = reduce(func, reshaped)
+                reduced = get_executor(self.executor).reduce(func, reshaped, fanin=fanin)
 
             # ensure that the shape of the reduced array is valid
             expected_shape = [self.shape[i] for i in range(len(self.shape)) if i not in axes]
@@ -532,6 +777,14 @@ class Data(Base):
         if isscalar(other):
             return self.map(lambda x: op(x, other))
 
+        if self.mode == 'local' and self._lazy and isinstance(other, (ndarray, Data)):
+            other = other.values if isinstance(other, Data) else other
+            return self.map(lambda kv: op(kv[1], other[kv[0]]), with_keys=True)
+
+        if self.mode == 'local' and isdisk(self.values) and isinstance(other, (ndarray, Data)):
+            other = other.values if isinstance(other, Data) else other
+            return self.map(lambda kv: op(kv[1], other[tuple(kv[0].T)]), with_keys=True, batch=True)
+
         if self.mode == 'local' and isinstance(other, ndarray):
             return self._constructor(op(self.values, other)).__finalize__(self)
 
@@ -539,6 +792,7 @@ class Data(Base):
             return self._constructor(op(self.values, other.values)).__finalize__(self)
 
         if self.mode == 'spark' and isinstance(other, Data):
+            from bolt.spark.array import BoltArraySpark
 
             def func(record):
                 (k1, x), (k2, y) = record
@@ -586,3 +840,151 @@ class Data(Base):
         """
         return self._constructor(
             self.values.clip(min=min, max=max)).__finalize__(self)
+
+
+class DeferredArray(object):
+    """
+    Local array defined by functions still to be applied to its records.
+
+    Consecutive functions are fused, so that each record passes through
+    all of them before the next record is processed. The array is computed
+    once, when first needed, and only the result is kept afterwards.
+
+    Parameters
+    ----------
+    source : ndarray
+        Array whose leading dimensions index the records.
+
+    key_shape : list[int]
+        Shape of the leading dimensions of source.
+
+    stages : list
+        Tuples of (func, with_keys, batch, dtype), applied in order,
+        results of each function are cast to its dtype if not None.
+
+    first : ndarray
+        Result of applying every stage to the first record.
+
+    dtype : numpy dtype, optional, default=None
+        Known dtype of the result, if None will be inferred.
+    """
+    def __init__(self, source, key_shape, stages, first, dtype=None):
+        self._source = source
+        self._key_shape = list(key_shape)
+        self._stages = stages
+        self._first = first
+        self._dtype = dtype
+        self._result = None
+
+    @classmethod
+    def defer(cls, source, key_shape, func, with_keys=False, batch=False, dtype=None):
+        """
+        Defer a function over the records of an array.
+
+        If source is a pending DeferredArray with the same keys,
+        the function is fused with the functions already pending.
+        Shape and dtype of the result are inferred by applying
+        the function to the first record.
+        """
+        if isinstance(source, DeferredArray) and source.pending and source._key_shape == list(key_shape):
+            stages = source._stages
+            first = source._first
+            source = source._source
+        else:
+            stages = []
+            first = source[(0,) * len(key_shape)]
+
+        stage = (func, with_keys, batch, dtype)
+        key = (0,) * len(key_shape)
+        probe = Data._unbatch(func, with_keys) if batch else func
+        first = _cast(_expand(probe((key, first)) if with_keys else probe(first)), dtype)
+
+        return cls(source, key_shape, stages + [stage], first, dtype)
+
+    @property
+    def pending(self):
+        return self._result is None
+
+    @property
+    def shape(self):
+        if not self.pending:
+            return self._result.shape
+        return tuple(self._key_shape) + self._first.shape
+
+    @property
+    def dtype(self):
+        if not self.pending:
+            return self._result.dtype
+        return dtype(self._dtype) if self._dtype is not None else self._first.dtype
+
+    def compute(self, executor=None):
+        """
+        Apply pending functions in a single pass over the records.
+
+        Parameters
+        ----------
+        executor : LocalExecutor, optional, default=None
+            Executor used to apply the functions, if None will use the default.
+        """
+        if self.pending:
+            n = int(prod(self._key_shape))
+            records = self._source.reshape((n,) + self._source.shape[len(self._key_shape):])
+            batches = [batch for _, _, batch, _ in self._stages if batch]
+            if batches:
+                size = min([n if batch is True else int(batch) for batch in batches])
+                results = Data._map_batched(_fuse_blocks(self._stages), records,
+                                            self._key_shape, size, True, executor)
+            else:
+                with_keys = any([keys for _, keys, _, _ in self._stages])
+                results = Data._map_records(_fuse_records(self._stages, with_keys), records,
+                                            self._key_shape, with_keys, executor)
+            allocator = allocate if isdisk(records) else empty
+            mapped = Data._collect(results, n, self._first.shape, self._dtype, allocator)
+            self._result = mapped.reshape(*(self._key_shape + list(mapped.shape[1:])))
+            self._source = None
+            self._stages = None
+        return self._result
+
+
+def _expand(x):
+    """
+    Convert a result to an array, storing scalars as records of shape (1,).
+    """
+    x = asarray(x)
+    return x.reshape(1) if x.ndim == 0 else x
+
+
+def _cast(x, dtype=None):
+    """
+    Cast a result to a dtype, if given, as when it is written into the output of a map.
+    """
+    return x if dtype is None else x.astype(dtype, copy=False)
+
+
+def _fuse_records(stages, with_keys=False):
+    """
+    Compose functions of single records into one function.
+    """
+    def fused(item):
+        key, x = item if with_keys else (None, item)
+        for func, keys, _, dtype in stages:
+            x = _cast(_expand(func((key, x)) if keys else func(x)), dtype)
+        return x
+    return fused
+
+
+def _fuse_blocks(stages):
+    """
+    Compose functions of single records and of blocks of records
+    into one function of a (keys, block) pair.
+    """
+    def fused(item):
+        keys, x = item
+        for func, with_keys, batch, dtype in stages:
+            if batch:
+                x = _cast(Data._check_batch(func((keys, x)) if with_keys else func(x), len(keys)), dtype)
+            else:
+                items = zip([tuple(k) for k in keys], x) if with_keys else x
+                x = Data._collect(enumerate(_expand(func(r)) for r in items), len(keys), dtype=dtype)
+        return x
+    return fused
@@ -1,6 +1,7 @@
 from numpy import prod, rollaxis
 
 from ..base import Base
+from ..profiling import profiled
 import logging
 
 
@@ -53,7 +54,12 @@ class Blocks(Base):
         """
         Apply an array -> array function to each block
         """
-        mapped = self.values.map(func, value_shape=value_shape, dtype=dtype)
+        if self.mode == 'spark':
+            mapped = self.values.map(func, value_shape=value_shape, dtype=dtype)
+
+        if self.mode == 'local':
+            mapped = self.values.map(func, value_shape=value_shape, dtype=dtype, executor=self.executor)
+
         return self._constructor(mapped).__finalize__(self, noprop=('dtype',))
 
     def map_generic(self, func):
@@ -72,6 +78,7 @@ class Blocks(Base):
         if self.mode == 'local':
             return self.values.first
 
+    @profiled()
     def toimages(self):
         """
         Convert blocks to images.
@@ -84,8 +91,9 @@ class Blocks(Base):
         if self.mode == 'local':
             values = self.values.unchunk()
 
-        return Images(values)
+        return Images(values).__finalize__(self)
 
+    @profiled()
     def toseries(self):
         """
         Converts blocks to series.
@@ -99,7 +107,7 @@ class Blocks(Base):
             values = self.values.unchunk()
             values = rollaxis(values, 0, values.ndim)
 
-        return Series(values)
+        return Series(values).__finalize__(self)
 
     def toarray(self):
         """
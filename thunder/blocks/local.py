@@ -1,8 +1,9 @@
 from numpy import arange, r_, empty, zeros, random, where, prod, array, asarray, floor
 from itertools import product
-from bolt.utils import allstack
 
 from ..base import Base
+from ..executors import get_executor
+from ..utils import allstack
 import logging
 
 
@@ -74,7 +75,7 @@ class LocalChunks:
 
         return allstack(arr.tolist())
 
-    def map(self, func, value_shape=None, dtype=None):
+    def map(self, func, value_shape=None, dtype=None, executor=None):
 
         if value_shape is None or dtype is None:
             # try to compute the size of each mapped element by applying func to a random array
@@ -104,8 +105,8 @@ class LocalChunks:
 
         c = prod(self.values.shape)
         mapped = empty(c, dtype=object)
-        for i, a in enumerate(self.values.flatten()):
-            mapped[i] = func(a)
+        for i, a in enumerate(get_executor(executor).map(func, self.values.flatten())):
+            mapped[i] = a
         return LocalChunks(mapped.reshape(self.values.shape), newshape, value_shape, dtype)
 
     def map_generic(self, func):
@@ -0,0 +1,263 @@
+"""
+Support for local data stored on disk as memory-mapped arrays.
+
+Local data whose values are backed by a numpy.memmap (for example,
+an array from numpy.load(path, mmap_mode='r') passed to fromarray)
+are processed in blocks of records that fit within a memory budget.
+Results of operations on such data (e.g. map, toseries, toimages) are
+themselves written to memory-mapped files in a scratch directory.
+"""
+import os
+from mmap import mmap
+from tempfile import mkstemp
+from numpy import memmap, array, prod
+
+from .stats import Summary
+
+
+def isdisk(values):
+    """
+    Check whether an array is backed by a memory-mapped file.
+
+    Parameters
+    ----------
+    values : array-like
+        Array to check, views of memory-mapped arrays are also detected.
+    """
+    while values is not None:
+        if isinstance(values, (memmap, mmap)):
+            return True
+        values = getattr(values, 'base', None)
+    return False
+
+
+def get_memory_budget():
+    """
+    Get the number of bytes of records to hold in memory at once.
+    """
+    return _budget[0]
+
+
+def set_memory_budget(nbytes=None):
+    """
+    Set the memory budget for processing data stored on disk.
+
+    Parameters
+    ----------
+    nbytes : int, optional, default = None
+        Maximum number of bytes of records to read into memory at once,
+        if None will restore the default of 1 GB.
+    """
+    if nbytes is None:
+        nbytes = DEFAULT_BUDGET
+    if nbytes < 1:
+        raise ValueError("Memory budget must be positive, got %g" % nbytes)
+    _budget[0] = int(nbytes)
+
+
+def set_scratch(path=None):
+    """
+    Set the directory for results of operations on data stored on disk.
+
+    Parameters
+    ----------
+    path : str, optional, default = None
+        Directory for memory-mapped results, if None will use
+        the default temporary directory.
+    """
+    if path is not None and not os.path.isdir(path):
+        raise ValueError("Scratch directory %s does not exist" % path)
+    _scratch[0] = path
+
+
+def allocate(shape, dtype):
+    """
+    Create a writable memory-mapped array in the scratch directory.
+
+    The file is removed once the array is no longer used.
+
+    Parameters
+    ----------
+    shape : tuple
+        Shape of the array.
+
+    dtype : numpy dtype
+        Data type of the array.
+    """
+    fd, path = mkstemp(suffix='.dat', prefix='thunder-', dir=_scratch[0])
+    os.close(fd)
+    if prod(shape) == 0:
+        os.remove(path)
+        return array([], dtype=dtype).reshape(shape)
+    out = memmap(path, dtype=dtype, mode='w+', shape=tuple(shape))
+    try:
+        # the mapping keeps the data available after the file is unlinked
+        os.remove(path)
+    except OSError:
+        pass
+    return out
+
+
+def blocksize(records, budget=None):
+    """
+    Get the number of records along the first axis that fit in the budget.
+
+    Parameters
+    ----------
+    records : ndarray
+        Array whose first axis indexes records.
+
+    budget : int, optional, default = None
+        Number of bytes, if None will use the memory budget.
+    """
+    return batchsize(int(prod(records.shape[1:])) * records.dtype.itemsize, budget)
+
+
+def batchsize(nbytes, budget=None):
+    """
+    Get the number of records that fit in the budget for a computation.
+
+    Parameters
+    ----------
+    nbytes : int
+        Number of bytes used by the computation for each record.
+
+    budget : int, optional, default = None
+        Number of bytes, if None will use the memory budget.
+    """
+    budget = get_memory_budget() if budget is None else budget
+    return max(1, budget // max(1, int(nbytes)))
+
+
+def iterblocks(records, budget=None):
+    """
+    Iterate over consecutive blocks of records along the first axis.
+
+    Yields pairs of slices and blocks. Arrays in memory are returned
+    as a single block. For arrays on disk, each block is read into memory
+    and fits within the budget.
+
+    Parameters
+    ----------
+    records : ndarray
+        Array whose first axis indexes records.
+
+    budget : int, optional, default = None
+        Number of bytes, if None will use the memory budget.
+    """
+    n = records.shape[0]
+    if not isdisk(records):
+        yield slice(0, n), records
+        return
+    size = blocksize(records, budget)
+    for start in range(0, n, size):
+        s = slice(start, min(start + size, n))
+        yield s, array(records[s])
+
+
+def transpose(values, axes, budget=None):
+    """
+    Transpose an array on disk into a new array on disk, in blocks.
+
+    Parameters
+    ----------
+    values : ndarray
+        Array to transpose.
+
+    axes : tuple
+        Permutation of the axes.
+
+    budget : int, optional, default = None
+        Number of bytes, if None will use the memory budget.
+    """
+    view = values.transpose(axes)
+    out = allocate(view.shape, view.dtype)
+    for s, block in iterblocks(view, budget):
+        out[s] = block
+    return out
+
+
+def compress(mask, records, budget=None):
+    """
+    Select records from an array on disk into a new array on disk, in blocks.
+
+    Parameters
+    ----------
+    mask : ndarray
+        Boolean array with one element per record.
+
+    records : ndarray
+        Array whose first axis indexes records.
+
+    budget : int, optional, default = None
+        Number of bytes, if None will use the memory budget.
+    """
+    out = allocate((int(mask.sum()),) + records.shape[1:], records.dtype)
+    start = 0
+    for s, block in iterblocks(records, budget):
+        selected = block[mask[s]]
+        out[start:start + len(selected)] = selected
+        start += len(selected)
+    return out
+
+
+def summarize(records, budget=None):
+    """
+    Summarize records along the first axis in a single pass.
+
+    Parameters
+    ----------
+    records : ndarray
+        Array whose first axis indexes records.
+
+    budget : int, optional, default = None
+        Number of bytes, if None will use the memory budget.
+    """
+    summary = Summary()
+    for _, block in iterblocks(records, budget):
+        summary.combine(Summary.of(block))
+    return summary
+
+
+def stat(values, name, axis=0, budget=None):
+    """
+    Compute a statistic over leading axes, keeping dimensions.
+
+    Arrays on disk are read in blocks within the budget, and the
+    statistic is accumulated across blocks. Other arrays (including
+    bolt arrays) use their own method for the statistic.
+
+    Parameters
+    ----------
+    values : array-like
+        Array to compute the statistic of.
+
+    name : str
+        One of 'sum', 'mean', 'var', 'std', 'min' or 'max'.
+
+    axis : int or tuple, optional, default = 0
+        Leading axes to compute the statistic over.
+
+    budget : int, optional, default = None
+        Number of bytes, if None will use the memory budget.
+    """
+    if not isdisk(values):
+        return getattr(values, name)(axis=axis, keepdims=True)
+
+    axes = axis if isinstance(axis, tuple) else (axis,)
+    if tuple(axes) != tuple(range(len(axes))):
+        raise ValueError("Statistics of arrays on disk must be over leading axes, got %s" % str(axes))
+    shape = values.shape[len(axes):]
+    records = values.reshape((-1,) + shape)
+
+    if name not in ('sum', 'mean', 'var', 'std', 'min', 'max'):
+        raise ValueError("Statistic must be one of sum, mean, var, std, min, max, got '%s'" % name)
+
+    result = getattr(summarize(records, budget), name)
+    return result.reshape((1,) * len(axes) + shape)
+
+
+DEFAULT_BUDGET = 2 ** 30
+
+_budget = [DEFAULT_BUDGET]
+_scratch = [None]
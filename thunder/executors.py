@@ -0,0 +1,324 @@
+"""
+Executors for parallelizing local computations on a single machine.
+
+An executor can be passed as the engine when loading data, and will
+then be used by functional operators (map, filter, reduce, foreach)
+on data in local mode. Data without an executor use the default
+executor, which is serial unless changed with set_executor.
+"""
+import pickle
+from abc import ABCMeta, abstractmethod
+from collections import deque
+from contextlib import contextmanager
+from functools import reduce, partial
+from numpy import ndarray
+from six import add_metaclass
+
+from .disk import get_memory_budget
+
+
+class LocalExecutor(object):
+    """
+    Serial executor for local computations.
+
+    Applies functions to items one at a time in the calling process.
+    Subclasses distribute items across a pool of workers.
+    """
+    def __init__(self, workers=1):
+        self._workers = workers
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.shutdown()
+
+    @property
+    def workers(self):
+        return self._workers
+
+    def map(self, func, items):
+        """
+        Apply a function to each item.
+
+        Returns an iterator over the results, in the same order as the items.
+
+        Parameters
+        ----------
+        func : function
+            Function of a single item.
+
+        items : iterable
+            Items to apply function to.
+        """
+        return (func(x) for x in items)
+
+    def reduce(self, func, items, fanin=None):
+        """
+        Reduce items with an associative function of two arguments.
+
+        Parameters
+        ----------
+        func : function
+            Function of two items that returns a single item.
+
+        items : iterable
+            Items to reduce.
+
+        fanin : int, optional, default = None
+            If given, reduce as a tree: items are split into groups of
+            this size, each group is reduced by a separate task, and the
+            results are reduced in the same way until one item remains.
+        """
+        if fanin is not None:
+            return self._tree(func, items, fanin)
+        return reduce(func, items)
+
+    def _tree(self, func, items, fanin):
+        """
+        Reduce items level by level, mapping over groups of fanin items.
+        """
+        if fanin < 2:
+            raise ValueError("Fan-in must be at least 2, got %g" % fanin)
+        items = list(items)
+        if len(items) == 0:
+            raise TypeError("reduce() of empty sequence with no initial value")
+        while len(items) > 1:
+            groups = [items[start:start + fanin] for start in range(0, len(items), fanin)]
+            items = list(self.map(partial(_fold, func), groups))
+        return items[0]
+
+    def shutdown(self):
+        """
+        Release any resources held by the executor.
+        """
+        pass
+
+
+@add_metaclass(ABCMeta)
+class PoolExecutor(LocalExecutor):
+    """
+    Base class for executors backed by a concurrent.futures pool.
+
+    Items are split into contiguous chunks, and each chunk
+    is processed by a single task on one of the workers.
+    At most workers * chunks tasks are in flight at once, and
+    chunks of arrays hold at most their share of the memory budget,
+    so results are bounded while they are consumed.
+    Subclasses create the pool.
+
+    Parameters
+    ----------
+    workers : int, optional, default = None
+        Number of workers, if None will use the number of cpus.
+
+    chunks : int, optional, default = 4
+        Number of chunks to create per worker, more chunks
+        improve load balancing at the cost of more overhead.
+    """
+    def __init__(self, workers=None, chunks=4):
+        if workers is None:
+            from multiprocessing import cpu_count
+            workers = cpu_count()
+        if workers < 1:
+            raise ValueError("Number of workers must be positive, got %g" % workers)
+        super(PoolExecutor, self).__init__(workers=workers)
+        self._chunks = chunks
+        self._pool = None
+
+    @abstractmethod
+    def _create(self):
+        """
+        Create the concurrent.futures pool of workers.
+        """
+
+    def _prepare(self, func):
+        return func
+
+    @property
+    def pool(self):
+        if self._pool is None:
+            self._pool = self._create()
+        return self._pool
+
+    @property
+    def _limit(self):
+        return self.workers * self._chunks
+
+    def _split(self, items):
+        """
+        Split items into contiguous chunks, one per task.
+        """
+        if not (hasattr(items, '__getitem__') and hasattr(items, '__len__')):
+            items = list(items)
+        n = len(items)
+        size = max(1, -(-n // self._limit))
+        if isinstance(items, ndarray) and n > 0:
+            size = min(size, max(1, get_memory_budget() // (self._limit * max(1, items.nbytes // n))))
+        return (items[start:start + size] for start in range(0, n, size))
+
+    def _submit(self, task, func, chunks):
+        """
+        Submit a task for each chunk, yielding results in order.
+
+        Further tasks are only submitted as results are consumed.
+        """
+        pending = deque()
+        for chunk in chunks:
+            if len(pending) >= self._limit:
+                yield pending.popleft().result()
+            pending.append(self.pool.submit(task, func, chunk))
+        while pending:
+            yield pending.popleft().result()
+
+    def map(self, func, items):
+        results = self._submit(_apply, self._prepare(func), self._split(items))
+        return (result for chunk in results for result in chunk)
+
+    def reduce(self, func, items, fanin=None):
+        if fanin is not None:
+            return self._tree(func, items, fanin)
+        results = self._submit(_fold, self._prepare(func), self._split(items))
+        try:
+            first = next(results)
+        except StopIteration:
+            raise TypeError("reduce() of empty sequence with no initial value")
+        return reduce(func, results, first)
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+    def __getstate__(self):
+        # pools cannot be serialized, a copy will create its own
+        state = self.__dict__.copy()
+        state['_pool'] = None
+        return state
+
+
+class ProcessExecutor(PoolExecutor):
+    """
+    Executor that distributes computations across a pool of processes.
+
+    Functions are serialized with cloudpickle, so lambdas and closures
+    can be used. Chunks of records are copied to and from the worker processes.
+
+    Parameters
+    ----------
+    workers : int, optional, default = None
+        Number of processes, if None will use the number of cpus.
+
+    chunks : int, optional, default = 4
+        Number of chunks to create per worker.
+    """
+    def __init__(self, workers=None, chunks=4):
+        try:
+            import cloudpickle
+        except ImportError:
+            raise ImportError('ProcessExecutor requires cloudpickle to serialize functions, '
+                              'install it with "pip install cloudpickle"')
+        super(ProcessExecutor, self).__init__(workers=workers, chunks=chunks)
+
+    def _create(self):
+        from concurrent.futures import ProcessPoolExecutor
+        return ProcessPoolExecutor(max_workers=self.workers)
+
+    def _prepare(self, func):
+        return _dumps(func)
+
+
+class ThreadExecutor(PoolExecutor):
+    """
+    Executor that distributes computations across a pool of threads.
+
+    Records are shared with the workers without copying, so this is
+    best suited to functions that release the GIL for most of their
+    runtime (e.g. many numpy, scipy.ndimage and tifffile routines).
+
+    Parameters
+    ----------
+    workers : int, optional, default = None
+        Number of threads, if None will use the number of cpus.
+
+    chunks : int, optional, default = 4
+        Number of chunks to create per worker.
+    """
+    def _create(self):
+        from concurrent.futures import ThreadPoolExecutor
+        return ThreadPoolExecutor(max_workers=self.workers)
+
+
+def get_executor(executor=None):
+    """
+    Get the executor to use for a local computation.
+
+    Parameters
+    ----------
+    executor : LocalExecutor, optional, default = None
+        Executor to use, if None will use the default executor.
+    """
+    if executor is not None:
+        return executor
+    return _default[0]
+
+
+def set_executor(executor=None):
+    """
+    Set the default executor for local computations.
+
+    The default is used by any data that does not have its own executor.
+
+    Parameters
+    ----------
+    executor : LocalExecutor, optional, default = None
+        Executor to use by default, if None will restore serial execution.
+    """
+    if executor is not None and not isinstance(executor, LocalExecutor):
+        raise ValueError("Executor must be a LocalExecutor, got %s" % type(executor))
+    _default[0] = executor if executor is not None else _serial
+
+
+@contextmanager
+def use_executor(executor):
+    """
+    Use an executor as the default within a with block.
+
+    Parameters
+    ----------
+    executor : LocalExecutor
+        Executor to use by default inside the block.
+    """
+    previous = _default[0]
+    set_executor(executor)
+    try:
+        yield executor
+    finally:
+        _default[0] = previous
+
+
+def _dumps(func):
+    """
+    Serialize a function for a worker process.
+    """
+    import cloudpickle
+    return cloudpickle.dumps(func, pickle.HIGHEST_PROTOCOL)
+
+
+def _loads(func):
+    if isinstance(func, bytes):
+        return pickle.loads(func)
+    return func
+
+
+def _apply(func, chunk):
+    func = _loads(func)
+    return [func(x) for x in chunk]
+
+
+def _fold(func, chunk):
+    return reduce(_loads(func), chunk)
+
+
+_serial = LocalExecutor()
+_default = [_serial]
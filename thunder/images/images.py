@@ -1,9 +1,13 @@
 import logging
 from numpy import ndarray, arange, amax, amin, size, asarray, random, prod, \
-    apply_along_axis
+    apply_along_axis, unique, searchsorted, ones, array, empty, float64, \
+    issubdtype, floating
 from itertools import product
 
 from ..base import Data
+from ..executors import get_executor
+from ..disk import isdisk, iterblocks, transpose, stat, batchsize, allocate
+from ..profiling import profiled
 
 
 class Images(Data):
@@ -57,6 +61,7 @@ class Images(Data):
         if self.mode == 'spark':
             return self.values.first().toarray()
 
+    @profiled()
     def toblocks(self, chunk_size='auto', padding=None):
         """
         Convert to blocks which represent subdivisions of the images data.
@@ -86,8 +91,9 @@ class Images(Data):
                 chunk_size = self.shape[1:]
             chunks = LocalChunks.chunk(self.values, chunk_size, padding=padding)
 
-        return Blocks(chunks)
+        return Blocks(chunks).__finalize__(self)
 
+    @profiled()
     def toseries(self, chunk_size='auto'):
         """
         Converts to series data.
@@ -111,10 +117,15 @@ class Images(Data):
         index = arange(self.shape[0])
 
         if self.mode == 'spark':
-            return Series(self.values.swap((0,), tuple(range(n)), size=chunk_size), index=index)
+            values = self.values.swap((0,), tuple(range(n)), size=chunk_size)
 
-        if self.mode == 'local':
-            return Series(self.values.transpose(tuple(range(1, n+1)) + (0,)), index=index)
+        if self.mode == 'local' and isdisk(self.values):
+            values = transpose(self.values, tuple(range(1, n+1)) + (0,))
+
+        elif self.mode == 'local':
+            values = self.values.transpose(tuple(range(1, n+1)) + (0,))
+
+        return Series(values, index=index).__finalize__(self, noprop=('labels',))
 
     def tolocal(self):
         """
@@ -148,11 +159,15 @@ class Images(Data):
         Execute a function on each image.
 
         Functions can have side effects. There is no return value.
+        Images stored on disk are read in blocks within the memory budget.
         """
         if self.mode == 'spark':
             self.values.tordd().map(lambda kv: (kv[0][0], kv[1])).foreach(func)
         else:
-            [func(kv) for kv in enumerate(self.values)]
+            executor = get_executor(self.executor)
+            for s, block in iterblocks(self.values):
+                for _ in executor.map(func, enumerate(block, s.start)):
+                    pass
 
     def sample(self, nsamples=100, seed=None):
         """
@@ -181,7 +196,7 @@ class Images(Data):
 
         return self._constructor(result)
 
-    def reduce(self, func):
+    def reduce(self, func, fanin=None):
         """
         Reduce a function over images.
 
@@ -189,44 +204,48 @@ class Images(Data):
         ----------
         func : function
             A function of two images.
+
+        fanin : int, optional, default = None
+            If given, reduce as a tree in which each task combines
+            this many images, using the executor (local only).
         """
-        return self._reduce(func, axis=0)
+        return self._reduce(func, axis=0, fanin=fanin)
 
     def mean(self):
         """
         Compute the mean across images.
         """
-        return self._constructor(self.values.mean(axis=0, keepdims=True))
+        return self._constructor(stat(self.values, 'mean', axis=0))
 
     def var(self):
         """
         Compute the variance across images.
         """
-        return self._constructor(self.values.var(axis=0, keepdims=True))
+        return self._constructor(stat(self.values, 'var', axis=0))
 
     def std(self):
         """
         Compute the standard deviation across images.
         """
-        return self._constructor(self.values.std(axis=0, keepdims=True))
+        return self._constructor(stat(self.values, 'std', axis=0))
 
     def sum(self):
         """
         Compute the sum across images.
         """
-        return self._constructor(self.values.sum(axis=0, keepdims=True))
+        return self._constructor(stat(self.values, 'sum', axis=0))
 
     def max(self):
         """
         Compute the max across images.
         """
-        return self._constructor(self.values.max(axis=0, keepdims=True))
+        return self._constructor(stat(self.values, 'max', axis=0))
 
     def min(self):
         """
         Compute the min across images.
         """
-        return self._constructor(self.values.min(axis=0, keepdims=True))
+        return self._constructor(stat(self.values, 'min', axis=0))
 
     def squeeze(self):
         """
@@ -317,7 +336,75 @@ class Images(Data):
         slices = [slice(0, value_shape[i], factor[i]) for i in range(ndims)]
         new_value_shape = tuple([roundup(value_shape[i], factor[i]) for i in range(ndims)])
 
-        return self.map(lambda v: v[slices], value_shape=new_value_shape)
+        # local data in memory are subsampled as a view of the whole array
+        if self.mode == 'local' and not self._lazy and not isdisk(self.values):
+            return self._constructor(self.values[tuple([slice(None)] + slices)]).__finalize__(self)
+
+        return self.map(lambda v: v[tuple([slice(None)] + slices)], value_shape=new_value_shape, batch=True)
+
+    def downsample(self, factor, time=1):
+        """
+        Downsample images by averaging blocks of pixels, and optionally of images.
+
+        Trailing pixels (or images) that do not fill a block are dropped.
+
+        Parameters
+        ----------
+        factor : positive int or tuple of positive ints
+            Size of the blocks of pixels to average. If a single int is passed,
+            each dimension of the image will be downsampled by this factor.
+            If a tuple is passed, each dimension will be downsampled by the given factor.
+
+        time : positive int, optional, default = 1
+            Number of consecutive images to average.
+        """
+        value_shape = self.value_shape
+        ndims = len(value_shape)
+        if not hasattr(factor, '__len__'):
+            factor = [factor] * ndims
+        factor = [int(sf) for sf in factor]
+        time = int(time)
+
+        if any((sf <= 0 for sf in factor)) or time <= 0:
+            raise ValueError('All sampling factors must be positive; got ' + str(factor + [time]))
+
+        # split each axis into blocks and positions within blocks, and average over the latter
+        nimages = self.shape[0] // time
+        shape = [value_shape[i] // factor[i] for i in range(ndims)]
+        split = [d for pair in zip([nimages] + shape, [time] + factor) for d in pair]
+        binned = tuple(slice(0, n * f) for n, f in zip([nimages] + shape, [time] + factor))
+        axes = tuple(range(1, 2 * (ndims + 1), 2))
+        noprop = ('labels',) if time > 1 else ()
+
+        # local data in memory are averaged in one operation over the whole array
+        if self.mode == 'local' and not self._lazy and not isdisk(self.values):
+            values = self.values[binned].reshape(split).mean(axis=axes)
+            return self._constructor(values).__finalize__(self, noprop=noprop)
+
+        data = self
+        if time > 1 and self.mode == 'spark':
+            from .readers import fromrdd
+            rdd = self.values.tordd()\
+                .filter(lambda kv: kv[0][0] < nimages * time)\
+                .map(lambda kv: (kv[0][0] // time, kv[1].astype('float64')))\
+                .reduceByKey(lambda left, right: left + right)\
+                .mapValues(lambda v: v / time)
+            data = fromrdd(rdd, dims=value_shape, nrecords=nimages, dtype='float64')\
+                .__finalize__(self, noprop=noprop)
+
+        elif time > 1:
+            values = self.values
+            dtype = values.dtype if issubdtype(values.dtype, floating) else float64
+            out = (allocate if isdisk(values) else empty)((nimages,) + value_shape, dtype)
+            size = max(1, batchsize(8 * 2 * prod(value_shape)) // time)
+            for start in range(0, nimages, size):
+                block = array(values[start * time:min(start + size, nimages) * time])
+                out[start:start + size] = block.reshape((-1, time) + value_shape).mean(axis=1)
+            data = self._constructor(out).__finalize__(self, noprop=noprop)
+
+        spatial = tuple(a - 1 for a in axes[1:])
+        func = lambda v: v[(slice(None),) + binned[1:]].reshape([len(v)] + split[2:]).mean(axis=spatial)
+        return data.map(func, value_shape=tuple(shape), batch=batchsize(8 * 2 * prod(value_shape)))
 
     def gaussian_filter(self, sigma=2, order=0):
         """
@@ -453,6 +540,73 @@ class Images(Data):
 
         return corr.toarray()
 
+    def extract_rois(self, masks):
+        """
+        Extract the mean time series of each region of interest.
+
+        Traces are computed for blocks of images as a product with a
+        sparse matrix of ROI weights, so the images are never converted
+        to series. Local images on disk are read in blocks within the
+        memory budget, and distributed images are projected one at a time.
+
+        Parameters
+        ----------
+        masks : ndarray or scipy.sparse matrix
+            Either an image of integer labels, with one ROI for each nonzero
+            label; or weights for each ROI, as an array with one image per ROI
+            or a sparse matrix with one row per ROI and one column per pixel.
+            Traces are means over each ROI, weighted by its weights.
+
+        Returns
+        -------
+        Series with one record per ROI, labeled by the ROI labels
+        (or positions), and indexed by image.
+        """
+        from scipy.sparse import csr_matrix, issparse, diags
+        from thunder.series.series import Series
+
+        npixels = int(prod(self.value_shape))
+
+        if issparse(masks):
+            weights = csr_matrix(masks, dtype='float64')
+            labels = arange(weights.shape[0])
+        else:
+            masks = asarray(masks)
+            if masks.shape == self.value_shape and masks.dtype.kind in 'iub':
+                labels = unique(masks[masks != 0])
+                rows = searchsorted(labels, masks.ravel())
+                keep = masks.ravel() != 0
+                weights = csr_matrix((ones(keep.sum()), (rows[keep], arange(npixels)[keep])),
+                                     shape=(len(labels), npixels))
+            elif masks.shape[1:] == self.value_shape:
+                weights = csr_matrix(masks.reshape(len(masks), -1), dtype='float64')
+                labels = arange(len(masks))
+            else:
+                raise ValueError("Masks must be a label image with shape %s, or weights for each ROI"
+                                 % str(self.value_shape))
+
+        if weights.shape[1] != npixels:
+            raise ValueError("Weights must have one column per pixel, %g, got %g"
+                             % (npixels, weights.shape[1]))
+
+        totals = asarray(weights.sum(axis=1)).ravel()
+        if (totals == 0).any():
+            raise ValueError("Every ROI must have nonzero weights")
+        weights = diags(1.0 / totals).dot(weights).tocsr()
+
+        def project(images):
+            return asarray(weights.dot(images.reshape(len(images), -1).T)).T
+
+        traces = self.map(project, value_shape=(len(labels),), dtype='float64',
+                          batch=batchsize(8 * 2 * npixels))
+
+        if self.mode == 'spark':
+            values = traces.values.toarray()
+        else:
+            values = traces.values
+
+        return Series(values.T, index=arange(self.shape[0]), labels=labels).__finalize__(self, noprop=('labels',))
+
     def subtract(self, val):
         """
         Subtract a constant value or an image from all images.
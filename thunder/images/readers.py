@@ -3,8 +3,9 @@ import logging
 from io import BytesIO
 from numpy import frombuffer, prod, random, asarray, expand_dims
 
-from ..utils import check_spark, check_options
-spark = check_spark()
+from ..utils import isspark, isbolt, check_options
+from ..executors import LocalExecutor, get_executor
+from ..profiling import profiled
 
 
 def fromrdd(rdd, dims=None, nrecords=None, dtype=None, labels=None, ordered=False):
@@ -55,6 +56,7 @@ def fromrdd(rdd, dims=None, nrecords=None, dtype=None, labels=None, ordered=Fals
     values = BoltArraySpark(rdd.map(process_keys), shape=(nrecords,) + tuple(dims), dtype=dtype, split=1, ordered=ordered)
     return Images(values, labels=labels)
 
+@profiled('images.fromarray')
 def fromarray(values, labels=None, npartitions=None, engine=None):
     """
     Load images from an array.
@@ -69,6 +71,9 @@ def fromarray(values, labels=None, npartitions=None, engine=None):
     values : array-like
         The array of images. Can be a numpy array,
         a bolt array, or an array-like.
+        A numpy.memmap (e.g. from numpy.load with mmap_mode)
+        will be kept on disk, and processed in blocks that fit
+        within the memory budget (see thunder.set_memory_budget).
 
     labels : array, optional, default = None
         Labels for records. If provided, should be one-dimensional.
@@ -77,12 +82,12 @@ def fromarray(values, labels=None, npartitions=None, engine=None):
         Number of partitions for parallelization (spark only)
 
     engine : object, default = None
-        Computational engine (e.g. a SparkContext for spark)
+        Computational engine (e.g. a SparkContext for spark,
+        or a LocalExecutor for local parallelism)
     """
     from .images import Images
-    import bolt
 
-    if isinstance(values, bolt.spark.array.BoltArraySpark):
+    if isbolt(values):
         return Images(values)
 
     values = asarray(values)
@@ -106,16 +111,21 @@ def fromarray(values, labels=None, npartitions=None, engine=None):
             raise ValueError('Arrays must all be of same data type; got both %s and %s' %
                              (str(dtype), str(im.dtype)))
 
-    if spark and isinstance(engine, spark):
+    if isspark(engine):
+        import bolt
         if not npartitions:
             npartitions = engine.defaultParallelism
         values = bolt.array(values, context=engine, npartitions=npartitions, axis=(0,))
         values._ordered = True
         return Images(values)
 
-    return Images(values, labels=labels)
+    data = Images(values, labels=labels)
+    if isinstance(engine, LocalExecutor):
+        data.executor = engine
+    return data
 
 
+@profiled('images.fromlist')
 def fromlist(items, accessor=None, keys=None, dims=None, dtype=None, labels=None, npartitions=None, engine=None):
     """
     Load images from a list of items using the given accessor.
@@ -137,7 +147,7 @@ def fromlist(items, accessor=None, keys=None, dims=None, dtype=None, labels=None
     npartitions : int
         Number of partitions for computational engine.
     """
-    if spark and isinstance(engine, spark):
+    if isspark(engine):
         nrecords = len(items)
         if keys:
             items = zip(keys, items)
@@ -154,8 +164,9 @@ def fromlist(items, accessor=None, keys=None, dims=None, dtype=None, labels=None
     else:
         if accessor:
             items = asarray([accessor(i) for i in items])
-        return fromarray(items, labels=labels)
+        return fromarray(items, labels=labels, engine=engine)
 
+@profiled('images.frompath')
 def frompath(path, accessor=None, ext=None, start=None, stop=None, recursive=False, npartitions=None, dims=None, dtype=None, labels=None, recount=False, engine=None, credentials=None):
     """
     Load images from a path using the given accessor.
@@ -198,7 +209,7 @@ def frompath(path, accessor=None, ext=None, start=None, stop=None, recursive=Fal
     data = reader.read(path, ext=ext, start=start, stop=stop,
                        recursive=recursive, npartitions=npartitions)
 
-    if spark and isinstance(engine, spark):
+    if isspark(engine):
         if accessor:
             data = data.flatMap(accessor)
         if recount:
@@ -215,12 +226,14 @@ def frompath(path, accessor=None, ext=None, start=None, stop=None, recursive=Fal
 
     else:
         if accessor:
-            data = [accessor(d) for d in data]
+            executor = get_executor(engine if isinstance(engine, LocalExecutor) else None)
+            data = list(executor.map(lambda d: list(accessor(d)), data))
         flattened = list(itertools.chain(*data))
         values = [kv[1] for kv in flattened]
-        return fromarray(values, labels=labels)
+        return fromarray(values, labels=labels, engine=engine)
 
 
+@profiled('images.frombinary')
 def frombinary(path, shape=None, dtype=None, ext='bin', start=None, stop=None, recursive=False, nplanes=None, npartitions=None, labels=None, conf='conf.json', order='C', engine=None, credentials=None):
     """
     Load images from flat binary files.
@@ -320,6 +333,7 @@ def frombinary(path, shape=None, dtype=None, ext='bin', start=None, stop=None, r
                     dims=newdims, dtype=dtype, labels=labels, recount=recount,
                     engine=engine, credentials=credentials)
 
+@profiled('images.fromtif')
 def fromtif(path, ext='tif', start=None, stop=None, recursive=False, nplanes=None, npartitions=None, labels=None, engine=None, credentials=None, discard_extra=False):
     """
     Loads images from single or multi-page TIF files.
@@ -396,6 +410,7 @@ def fromtif(path, ext='tif', start=None, stop=None, recursive=False, nplanes=Non
         data = data.repartition(npartitions)
     return data
 
+@profiled('images.frompng')
 def frompng(path, ext='png', start=None, stop=None, recursive=False, npartitions=None, labels=None, engine=None, credentials=None):
     """
     Load images from PNG files.
@@ -490,7 +505,7 @@ def fromexample(name=None, engine=None):
     if name == 'fish':
         data = fromtif(path=path, npartitions=1, engine=engine)
 
-    if spark and isinstance(engine, spark):
+    if isspark(engine):
         data.cache()
         data.compute()
 
@@ -1,6 +1,9 @@
 import json
 
+from ..profiling import profiled
 
+
+@profiled('images.topng')
 def topng(images, path, prefix="image", overwrite=False, credentials=None):
     """
     Write out PNG files for 2d image data.
@@ -28,6 +31,7 @@ def topng(images, path, prefix="image", overwrite=False, credentials=None):
     writer = get_parallel_writer(path)(path, overwrite=overwrite, credentials=credentials)
     images.foreach(lambda x: writer.write(tobuffer(x)))
 
+@profiled('images.totif')
 def totif(images, path, prefix="image", overwrite=False, credentials=None):
     """
     Write out TIF files for 2d image data.
@@ -55,6 +59,7 @@ def totif(images, path, prefix="image", overwrite=False, credentials=None):
     writer = get_parallel_writer(path)(path, overwrite=overwrite, credentials=credentials)
     images.foreach(lambda x: writer.write(tobuffer(x)))
 
+@profiled('images.tobinary')
 def tobinary(images, path, prefix="image", overwrite=False, credentials=None):
     """
     Write out images as binary files.
@@ -0,0 +1,197 @@
+"""
+Instrumentation of thunder operations.
+
+Operations on data (map, filter, reduce, conversions) as well as
+readers and writers report each call to any active hooks. The simplest
+hook is a Report, collected with the profile context manager:
+
+>>> with thunder.profile() as report:
+...     data = thunder.images.fromtif(path).toseries().detrend()
+>>> report.tojson('profile.json')
+"""
+import sys
+import json
+from time import time
+from functools import wraps
+from contextlib import contextmanager
+from numpy import prod, dtype
+
+
+class Report(object):
+    """
+    Record of calls to thunder operations.
+
+    Each call is a dict with the name of the operation, its nesting
+    depth, wall time in seconds, bytes and number of records of its
+    input and output data (None if not applicable), and the increase in
+    peak resident memory of the process in bytes (None if not available).
+    """
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, call):
+        self.calls.append(call)
+
+    def summary(self):
+        """
+        Aggregate calls by operation name.
+
+        Counts calls and adds up times, bytes, and records,
+        and takes the largest increase in peak memory.
+        """
+        summary = {}
+        for call in self.calls:
+            entry = summary.setdefault(call['name'], {'calls': 0})
+            entry['calls'] += 1
+            for key in ['time', 'bytes_in', 'bytes_out', 'records_in', 'records_out', 'rss_delta']:
+                value = call[key]
+                if value is None:
+                    entry.setdefault(key, None)
+                elif entry.get(key) is None:
+                    entry[key] = value
+                elif key == 'rss_delta':
+                    entry[key] = max(entry[key], value)
+                else:
+                    entry[key] += value
+        return summary
+
+    def todict(self):
+        return {'calls': self.calls, 'summary': self.summary()}
+
+    def tojson(self, path=None, indent=2):
+        """
+        Convert the report to JSON.
+
+        Parameters
+        ----------
+        path : str, optional, default = None
+            If given, will also write the JSON to this file.
+
+        indent : int, optional, default = 2
+            Indentation of the JSON.
+        """
+        output = json.dumps(self.todict(), indent=indent, sort_keys=True)
+        if path is not None:
+            with open(path, 'w') as f:
+                f.write(output)
+        return output
+
+
+@contextmanager
+def profile():
+    """
+    Profile thunder operations within a with block.
+
+    Yields a Report collecting every call made inside the block.
+    """
+    report = Report()
+    add_hook(report)
+    try:
+        yield report
+    finally:
+        remove_hook(report)
+
+
+def add_hook(hook):
+    """
+    Register a function to be called with a dict describing each operation.
+
+    Parameters
+    ----------
+    hook : function
+        Function of a single dict, see Report for its contents.
+    """
+    _hooks.append(hook)
+
+
+def remove_hook(hook):
+    """
+    Remove a registered hook.
+
+    Parameters
+    ----------
+    hook : function
+        A function previously passed to add_hook.
+    """
+    _hooks.remove(hook)
+
+
+def profiled(name=None):
+    """
+    Decorate an operation so that calls are reported to hooks.
+
+    Parameters
+    ----------
+    name : str, optional, default = None
+        Name of the operation. If None, the operation is a method,
+        and will be named from the class of the object and the method.
+    """
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _hooks:
+                return func(*args, **kwargs)
+
+            label = name if name is not None else '%s.%s' % (type(args[0]).__name__, func.__name__)
+            source = next((arg for arg in args[:1] + tuple(kwargs.values()) if _isdata(arg)), None)
+            rss = _maxrss()
+            start = time()
+            _depth[0] += 1
+            try:
+                result = func(*args, **kwargs)
+            finally:
+                _depth[0] -= 1
+            elapsed = time() - start
+            after = _maxrss()
+
+            output = result if _isdata(result) else None
+            call = {
+                'name': label,
+                'depth': _depth[0],
+                'time': elapsed,
+                'bytes_in': _nbytes(source),
+                'bytes_out': _nbytes(output),
+                'records_in': _nrecords(source),
+                'records_out': _nrecords(output),
+                'rss_delta': None if rss is None else after - rss
+            }
+            for hook in list(_hooks):
+                hook(call)
+            return result
+        return wrapper
+    return decorator
+
+
+def _isdata(obj):
+    from .base import Base
+    return isinstance(obj, Base)
+
+
+def _nbytes(data):
+    # computed from metadata, to avoid forcing any lazy computations
+    if data is None:
+        return None
+    try:
+        return int(prod(data.shape)) * dtype(data.dtype).itemsize
+    except Exception:
+        return None
+
+
+def _nrecords(data):
+    if data is None or not hasattr(data, 'baseaxes'):
+        return None
+    return int(prod(data.baseshape))
+
+
+def _maxrss():
+    try:
+        import resource
+    except ImportError:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # reported in bytes on mac and kilobytes elsewhere
+    return rss if sys.platform == 'darwin' else rss * 1024
+
+
+_hooks = []
+_depth = [0]
@@ -14,8 +14,8 @@ except ImportError:
 from six.moves import filter
 from six import next
 
-from .utils import check_spark
-spark = check_spark()
+from .utils import isspark
+from .executors import LocalExecutor, get_executor
 logging.getLogger('boto').setLevel(logging.CRITICAL)
 
 def addextension(path, ext=None):
@@ -124,6 +124,8 @@ class FileNotFoundError(IOError):
 class LocalParallelReader(object):
     """
     Parallel reader backed by python's native file() objects.
+
+    If the engine is a local executor, files will be read with the executor.
     """
     def __init__(self, engine=None, **kwargs):
         self.engine = engine
@@ -154,12 +156,13 @@ class LocalParallelReader(object):
         nfiles = len(files)
         self.nfiles = nfiles
 
-        if spark and isinstance(self.engine, spark):
+        if isspark(self.engine):
             npartitions = min(npartitions, nfiles) if npartitions else nfiles
             rdd = self.engine.parallelize(enumerate(files), npartitions)
             return rdd.map(lambda kv: (kv[0], readlocal(kv[1]), kv[1]))
         else:
-            return [(k, readlocal(v), v) for k, v in enumerate(files)]
+            executor = get_executor(self.engine if isinstance(self.engine, LocalExecutor) else None)
+            return list(executor.map(lambda kv: (kv[0], readlocal(kv[1]), kv[1]), enumerate(files)))
 
 
 class LocalFileReader(object):
@@ -388,7 +391,7 @@ class BotoParallelReader(BotoClient):
 
         self.nfiles = len(keylist)
 
-        if spark and isinstance(self.engine, spark):
+        if isspark(self.engine):
 
             def getsplit(kvIter):
                 if scheme == 's3' or scheme == 's3n':
@@ -6,8 +6,9 @@ try:
 except NameError:
     buffer = memoryview
 
-from ..utils import check_spark, check_options
-spark = check_spark()
+from ..utils import isspark, isbolt, check_options
+from ..executors import LocalExecutor
+from ..profiling import profiled
 
 
 def fromrdd(rdd, nrecords=None, shape=None, index=None, labels=None, dtype=None, ordered=False):
@@ -71,6 +72,7 @@ def fromrdd(rdd, nrecords=None, shape=None, index=None, labels=None, dtype=None,
     values = BoltArraySpark(rdd.map(process_keys), shape=shape, dtype=dtype, split=len(shape)-1, ordered=ordered)
     return Series(values, index=index, labels=labels)
 
+@profiled('series.fromarray')
 def fromarray(values, index=None, labels=None, npartitions=None, engine=None):
     """
     Load series data from an array.
@@ -84,6 +86,9 @@ def fromarray(values, index=None, labels=None, npartitions=None, engine=None):
     values : array-like
         An array containing the data. Can be a numpy array,
         a bolt array, or an array-like.
+        A numpy.memmap (e.g. from numpy.load with mmap_mode)
+        will be kept on disk, and processed in blocks that fit
+        within the memory budget (see thunder.set_memory_budget).
 
     index : array, optional, default = None
         Index for records, if not provided will use (0,1,...,N)
@@ -96,12 +101,12 @@ def fromarray(values, index=None, labels=None, npartitions=None, engine=None):
         Number of partitions for parallelization (Spark only)
 
     engine : object, default = None
-        Computational engine (e.g. a SparkContext for Spark)
+        Computational engine (e.g. a SparkContext for Spark,
+        or a LocalExecutor for local parallelism)
     """
     from .series import Series
-    import bolt
 
-    if isinstance(values, bolt.spark.array.BoltArraySpark):
+    if isbolt(values):
         return Series(values)
 
     values = asarray(values)
@@ -115,14 +120,19 @@ def fromarray(values, index=None, labels=None, npartitions=None, engine=None):
     if index is None:
         index = arange(values.shape[-1])
 
-    if spark and isinstance(engine, spark):
+    if isspark(engine):
+        import bolt
         axis = tuple(range(values.ndim - 1))
         values = bolt.array(values, context=engine, npartitions=npartitions, axis=axis)
         values._ordered = True
         return Series(values, index=index)
 
-    return Series(values, index=index, labels=labels)
+    data = Series(values, index=index, labels=labels)
+    if isinstance(engine, LocalExecutor):
+        data.executor = engine
+    return data
 
+@profiled('series.fromlist')
 def fromlist(items, accessor=None, index=None, labels=None, dtype=None, npartitions=None, engine=None):
     """
     Load series data from a list with an optional accessor function.
@@ -154,7 +164,7 @@ def fromlist(items, accessor=None, index=None, labels=None, dtype=None, npartiti
     engine : object, default = None
         Computational engine (e.g. a SparkContext for Spark)
     """
-    if spark and isinstance(engine, spark):
+    if isspark(engine):
         if dtype is None:
             dtype = accessor(items[0]).dtype if accessor else items[0].dtype
         nrecords = len(items)
@@ -170,8 +180,9 @@ def fromlist(items, accessor=None, index=None, labels=None, dtype=None, npartiti
     else:
         if accessor:
             items = [accessor(i) for i in items]
-        return fromarray(items, index=index, labels=labels)
+        return fromarray(items, index=index, labels=labels, engine=engine)
 
+@profiled('series.fromtext')
 def fromtext(path, ext='txt', dtype='float64', skip=0, shape=None, index=None, labels=None, npartitions=None, engine=None, credentials=None):
     """
     Loads series data from text files.
@@ -217,7 +228,7 @@ def fromtext(path, ext='txt', dtype='float64', skip=0, shape=None, index=None, l
     from thunder.readers import normalize_scheme, get_parallel_reader
     path = normalize_scheme(path, ext)
 
-    if spark and isinstance(engine, spark):
+    if isspark(engine):
 
         def parse(line, skip):
             vec = [float(x) for x in line.split(' ')]
@@ -249,8 +260,9 @@ def fromtext(path, ext='txt', dtype='float64', skip=0, shape=None, index=None, l
         if shape:
             values = values.reshape(shape)
 
-        return fromarray(values, index=index, labels=labels)
+        return fromarray(values, index=index, labels=labels, engine=engine)
 
+@profiled('series.frombinary')
 def frombinary(path, ext='bin', conf='conf.json', dtype=None, shape=None, skip=0, index=None, labels=None, engine=None, credentials=None):
     """
     Load series data from flat binary files.
@@ -298,7 +310,7 @@ def frombinary(path, ext='bin', conf='conf.json', dtype=None, shape=None, skip=0
     nelements = shape[-1] + skip
     recordsize = dtype_func(dtype).itemsize * nelements
 
-    if spark and isinstance(engine, spark):
+    if isspark(engine):
         lines = engine.binaryRecords(path, recordsize)
         raw = lines.map(lambda x: frombuffer(buffer(x), offset=0, count=nelements, dtype=dtype)[skip:])
 
@@ -339,7 +351,7 @@ def frombinary(path, ext='bin', conf='conf.json', dtype=None, shape=None, skip=0
         if shape:
             values = values.reshape(shape)
 
-        return fromarray(values, index=index, labels=labels)
+        return fromarray(values, index=index, labels=labels, engine=engine)
 
 def _binaryconfig(path, conf, dtype=None, shape=None, credentials=None):
     """
@@ -437,7 +449,7 @@ def fromexample(name=None, engine=None):
                 key.get_contents_to_filename(os.path.join(d, key.name))
         data = frombinary(os.path.join(d, 'series', name), engine=engine)
 
-        if spark and isinstance(engine, spark):
+        if isspark(engine):
             data.cache()
             data.compute()
 
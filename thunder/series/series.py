@@ -1,16 +1,21 @@
 from numpy import array, mean, median, std, size, arange, percentile,\
-    asarray, zeros, corrcoef, where, unique, array_equal, delete, \
+    asarray, zeros, where, unique, delete, \
     ravel, logical_not, unravel_index, prod, random, shape, \
     dot, outer, expand_dims, ScalarType, ndarray, sqrt, pi, angle, fft, \
-    roll, polyfit, polyval, ceil, float64, fix, floor
+    ceil, float64, fix, floor, errstate, nan, log2, \
+    concatenate, vander, linspace, minimum, maximum, isin, ravel_multi_index, \
+    searchsorted, diff, append, add, issubdtype, floating, result_type, \
+    integer, rint, isnan
+from numpy.linalg import qr
 import logging
 from itertools import product
-from bolt.utils import tupleize
 from six import string_types
-from ..utils import check_options
+from ..utils import check_options, tupleize, notsupported
 
 
 from ..base import Data
+from ..disk import isdisk, transpose, stat, batchsize
+from ..profiling import profiled
 
 
 class Series(Data):
@@ -39,6 +44,7 @@ class Series(Data):
         super(Series, self).__init__(values, mode=mode)
         self.labels = labels
         self._index = None
+        self._groups_cache = {}
         if index is not None:
             self._index = index
 
@@ -65,6 +71,7 @@ class Series(Data):
             raise ValueError("Length of new index '%g' must match length of original index '%g'"
                              .format(lenvalue, lenself))
         self._index = value
+        self._groups_cache = {}
 
     @property
     def length(self):
@@ -162,7 +169,7 @@ class Series(Data):
 
         return self._constructor(result, index=self.index)
 
-    def map(self, func, index=None, value_shape=None, dtype=None, with_keys=False):
+    def map(self, func, index=None, value_shape=None, dtype=None, with_keys=False, batch=False):
         """
         Map an array -> array function over each record.
 
@@ -175,14 +182,18 @@ class Series(Data):
             If known, the index to be used following function evaluation.
 
         value_shape : int, optional, default=None
-            Known shape of values resulting from operation. Only
-            valid in spark mode.
+            Known shape of values resulting from operation.
 
         dtype : numpy.dtype, optional, default = None
             If known, the type of the data following function evaluation.
 
         with_keys : boolean, optional, default = False
             If true, function should be of both tuple indices and series values.
+
+        batch : boolean or int, optional, default = False
+            If true, function should be of a two-dimensional array of records
+            (one per row) and return one row per record. An int sets the
+            maximum number of records per block.
         """
         # if new index is given, can infer missing value_shape
         if value_shape is None and index is not None:
@@ -190,7 +201,8 @@ class Series(Data):
 
         if isinstance(value_shape, int):
             values_shape = (value_shape, )
-        new = super(Series, self).map(func, value_shape=value_shape, dtype=dtype, with_keys=with_keys)
+        new = super(Series, self).map(func, value_shape=value_shape, dtype=dtype, with_keys=with_keys,
+                                      batch=batch)
 
         if index is not None:
             new.index = index
@@ -201,7 +213,7 @@ class Series(Data):
 
         return new
 
-    def reduce(self, func):
+    def reduce(self, func, fanin=None):
         """
         Reduce a function over records.
 
@@ -209,44 +221,48 @@ class Series(Data):
         ----------
         func : function
             A function of two records.
+
+        fanin : int, optional, default = None
+            If given, reduce as a tree in which each task combines
+            this many records, using the executor (local only).
         """
-        return self._reduce(func, axis=self.baseaxes)
+        return self._reduce(func, axis=self.baseaxes, fanin=fanin)
 
     def mean(self):
         """
         Compute the mean across records
         """
-        return self._constructor(self.values.mean(axis=self.baseaxes, keepdims=True))
+        return self._constructor(stat(self.values, 'mean', axis=self.baseaxes))
 
     def var(self):
         """
         Compute the variance across records
         """
-        return self._constructor(self.values.var(axis=self.baseaxes, keepdims=True))
+        return self._constructor(stat(self.values, 'var', axis=self.baseaxes))
 
     def std(self):
         """
         Compute the standard deviation across records.
         """
-        return self._constructor(self.values.std(axis=self.baseaxes, keepdims=True))
+        return self._constructor(stat(self.values, 'std', axis=self.baseaxes))
 
     def sum(self):
         """
         Compute the sum across records.
         """
-        return self._constructor(self.values.sum(axis=self.baseaxes, keepdims=True))
+        return self._constructor(stat(self.values, 'sum', axis=self.baseaxes))
 
     def max(self):
         """
         Compute the max across records.
         """
-        return self._constructor(self.values.max(axis=self.baseaxes, keepdims=True))
+        return self._constructor(stat(self.values, 'max', axis=self.baseaxes))
 
     def min(self):
         """
         Compute the min across records.
         """
-        return self._constructor(self.values.min(axis=self.baseaxes, keepdims=True))
+        return self._constructor(stat(self.values, 'min', axis=self.baseaxes))
 
     def reshape(self, *shape):
         """
@@ -286,8 +302,14 @@ class Series(Data):
         right: int
             Right-most index in the desired range.
         """
-        crit = lambda x: left <= x < right
-        return self.select(crit)
+        index = asarray(self.index)
+        if index.ndim == 1 and index.dtype.kind in 'iuf' and (diff(index) >= 0).all():
+            start, stop = searchsorted(index, [left, right], side='left')
+            mask = zeros(len(index), dtype=bool)
+            mask[start:stop] = True
+        else:
+            mask = array([left <= i < right for i in self.index], dtype=bool)
+        return self._select_mask(mask)
 
     def select(self, crit):
         """
@@ -301,6 +323,9 @@ class Series(Data):
         """
         import types
 
+        index = self.index
+        values = asarray(index)
+
         # handle lists, strings, and ints
         if not isinstance(crit, types.FunctionType):
             # set("foo") -> {"f", "o"}; wrap in list to prevent:
@@ -312,42 +337,64 @@ class Series(Data):
                 except TypeError:
                     # typically means crit is not an iterable type; for instance, crit is an int
                     critlist = set([crit])
-            crit = lambda x: x in critlist
 
-        # if only one index, return it directly or throw an error
+            # compare numbers or strings as arrays, and anything else one element at a time
+            targets = asarray(list(critlist))
+            kinds = values.dtype.kind + targets.dtype.kind
+            if values.ndim == 1 and targets.ndim == 1 and \
+                    (set(kinds) <= set('iuf') or set(kinds) <= set('US')):
+                mask = isin(values, targets)
+            else:
+                mask = array([i in critlist for i in index], dtype=bool)
+        else:
+            mask = array([bool(crit(i)) for i in index], dtype=bool)
+
+        return self._select_mask(mask)
+
+    def _select_mask(self, mask, newindex=None):
+        """
+        Select the values at positions of the index where a mask is true.
+
+        Evenly spaced selections of local data are views of the original values,
+        other selections take values along the last axis in one operation.
+        If a new index is not given, it is selected from the index.
+        """
         index = self.index
-        if size(index) == 1:
-            if crit(index[0]):
+        positions = where(mask)[0]
+
+        if newindex is None:
+            # if only one index, return it directly or throw an error
+            if size(index) == 1:
+                if mask[0]:
+                    return self
+                else:
+                    raise Exception('No indices found matching criterion')
+            if len(positions) == len(mask):
                 return self
-            else:
-                raise Exception('No indices found matching criterion')
+            newindex = [index[i] for i in positions]
+            if isinstance(index, ndarray):
+                newindex = index[positions]
 
-        # determine new index and check the result
-        newindex = [i for i in index if crit(i)]
-        if len(newindex) == 0:
+        if len(positions) == 0:
             raise Exception('No indices found matching criterion')
-        if array(newindex == index).all():
-            return self
 
-        # use fast logical indexing to get the new values
-        subinds = where([crit(i) for i in index])
-        new = self.map(lambda x: x[subinds], index=newindex)
-
-        # if singleton, need to check whether it's an array or a scalar/int
-        # if array, recompute a new set of indices
-        if len(newindex) == 1:
-            new = new.map(lambda x: x[0], index=newindex)
-            val = new.first()
-            if size(val) == 1:
-                newindex = [newindex[0]]
+        step = positions[1] - positions[0] if len(positions) > 1 else 1
+        regular = (diff(positions) == step).all()
+
+        if self.mode == 'local' and not self._lazy and (regular or not isdisk(self.values)):
+            if regular:
+                values = self.values[..., positions[0]:positions[-1] + 1:step]
             else:
-                newindex = arange(0, size(val))
+                values = self.values.take(positions, axis=-1)
+            new = self._constructor(values).__finalize__(self, noprop=('index',))
+        else:
+            new = self.map(lambda x: x[:, positions], value_shape=(len(positions),),
+                           batch=batchsize(8 * 2 * self.shape[-1]))
 
         new._index = newindex
-
         return new
 
-    def center(self, axis=1):
+    def center(self, axis=1, inplace=False):
         """
         Subtract the mean either within or across records.
 
@@ -355,16 +402,25 @@ class Series(Data):
         ----------
         axis : int, optional, default = 1
             Which axis to center along, within (1) or across (0) records.
+
+        inplace : bool, optional, default = False
+            Whether to overwrite the values instead of returning new data,
+            only for local floating point data. Values are modified where
+            they are stored, so the array they were created from and data
+            sharing them (e.g. from toimages or between) change too. Values
+            that are part of a larger array are copied, with a warning,
+            before they are modified.
         """
         if axis == 1:
-            return self.map(lambda x: x - mean(x))
+            func = lambda x: x - x.mean(axis=-1, keepdims=True)
         elif axis == 0:
             meanval = self.mean().toarray()
-            return self.map(lambda x: x - meanval)
+            func = lambda x: x - meanval
         else:
             raise Exception('Axis must be 0 or 1')
+        return self._transform(func, inplace)
 
-    def standardize(self, axis=1):
+    def standardize(self, axis=1, inplace=False):
         """
         Divide by standard deviation either within or across records.
 
@@ -372,16 +428,25 @@ class Series(Data):
         ----------
         axis : int, optional, default = 0
             Which axis to standardize along, within (1) or across (0) records
+
+        inplace : bool, optional, default = False
+            Whether to overwrite the values instead of returning new data,
+            only for local floating point data. Values are modified where
+            they are stored, so the array they were created from and data
+            sharing them (e.g. from toimages or between) change too. Values
+            that are part of a larger array are copied, with a warning,
+            before they are modified.
         """
         if axis == 1:
-            return self.map(lambda x: x / std(x))
+            func = lambda x: x / x.std(axis=-1, keepdims=True)
         elif axis == 0:
             stdval = self.std().toarray()
-            return self.map(lambda x: x / stdval)
+            func = lambda x: x / stdval
         else:
             raise Exception('Axis must be 0 or 1')
+        return self._transform(func, inplace)
 
-    def zscore(self, axis=1):
+    def zscore(self, axis=1, inplace=False):
         """
         Subtract the mean and divide by standard deviation within or across records.
 
@@ -389,17 +454,26 @@ class Series(Data):
         ----------
         axis : int, optional, default = 0
             Which axis to zscore along, within (1) or across (0) records
+
+        inplace : bool, optional, default = False
+            Whether to overwrite the values instead of returning new data,
+            only for local floating point data. Values are modified where
+            they are stored, so the array they were created from and data
+            sharing them (e.g. from toimages or between) change too. Values
+            that are part of a larger array are copied, with a warning,
+            before they are modified.
         """
         if axis == 1:
-            return self.map(lambda x: (x - mean(x)) / std(x))
+            func = lambda x: (x - x.mean(axis=-1, keepdims=True)) / x.std(axis=-1, keepdims=True)
         elif axis == 0:
             meanval = self.mean().toarray()
             stdval = self.std().toarray()
-            return self.map(lambda x: (x - meanval) / stdval)
+            func = lambda x: (x - meanval) / stdval
         else:
             raise Exception('Axis must be 0 or 1')
+        return self._transform(func, inplace)
 
-    def squelch(self, threshold):
+    def squelch(self, threshold, inplace=False):
         """
         Set all records that do not exceed the given threhsold to 0.
 
@@ -407,9 +481,53 @@ class Series(Data):
         ----------
         threshold : scalar
             Level below which to set records to zero
-        """
-        func = lambda x: zeros(x.shape) if max(x) < threshold else x
-        return self.map(func)
+
+        inplace : bool, optional, default = False
+            Whether to overwrite the values instead of returning new data,
+            only for local data. Values are modified where they are stored,
+            so the array they were created from and data sharing them (e.g.
+            from toimages or between) change too. Values that are part of a
+            larger array are copied, with a warning, before they are modified.
+        """
+        func = lambda x: where(x.max(axis=-1, keepdims=True) < threshold, 0, x)
+        return self._transform(func, inplace, floats=False)
+
+    def _transform(self, func, inplace=False, floats=True):
+        """
+        Apply a function that preserves the shape of records to blocks of records.
+
+        The function is applied along the last axis of blocks of records.
+        If inplace, the data are returned with their values replaced, which
+        is supported for local data (of floating point type if floats is True).
+        Values are overwritten one block at a time, unless they are part of a
+        larger array (e.g. from between or select), in which case the results
+        are computed into a copy, as writing through would modify the rest.
+        """
+        if inplace and self.mode == 'spark':
+            notsupported(self.mode)
+            inplace = False
+
+        if not inplace:
+            return self.map(func, batch=batchsize(8 * 3 * self.shape[-1]))
+
+        values = self.values
+        if not values.flags.writeable:
+            raise ValueError('Values are read-only, and cannot be modified in place')
+        if floats and not issubdtype(values.dtype, floating):
+            raise ValueError('Values of type %s cannot be modified in place, '
+                             'as results are floating point' % values.dtype)
+
+        if not _spans(values):
+            logging.getLogger('thunder').warning('Values are part of a larger array, '
+                                                 'and are copied instead of modified in place')
+            self._values = self._transform(func).values
+            return self
+
+        size = batchsize(8 * 3 * prod(values.shape[1:]))
+        for start in range(0, values.shape[0], size):
+            s = slice(start, start + size)
+            values[s] = func(values[s])
+        return self
 
     def correlate(self, signal):
         """
@@ -422,22 +540,26 @@ class Series(Data):
         """
         s = asarray(signal)
 
-        if s.ndim == 1:
-            if size(s) != self.shape[-1]:
-                raise ValueError("Length of signal '%g' does not match record length '%g'"
-                                 % (size(s), self.shape[-1]))
+        if s.ndim not in (1, 2):
+            raise Exception('Signal to correlate with must have 1 or 2 dimensions')
+
+        if s.shape[-1] != self.shape[-1]:
+            raise ValueError("Length of signal '%g' does not match record length '%g'"
+                             % (s.shape[-1], self.shape[-1]))
 
-            return self.map(lambda x: corrcoef(x, s)[0, 1], index=[1])
+        # correlations are products of records and signals standardized to unit norm
+        signals = _unitnorm(array(s, ndmin=2, dtype=float64)).T
 
-        elif s.ndim == 2:
-            if s.shape[1] != self.shape[-1]:
-                raise ValueError("Length of signal '%g' does not match record length '%g'"
-                                 % (s.shape[1], self.shape[-1]))
-            newindex = arange(0, s.shape[0])
-            return self.map(lambda x: array([corrcoef(x, y)[0, 1] for y in s]), index=newindex)
+        def func(x):
+            return dot(_unitnorm(x.astype(float64)), signals)
 
+        if s.ndim == 1:
+            index = [1]
         else:
-            raise Exception('Signal to correlate with must have 1 or 2 dimensions')
+            index = arange(0, s.shape[0])
+
+        batch = batchsize(self.shape[-1] * 8)
+        return self.map(func, index=index, dtype=float64, batch=batch)
 
     def _check_panel(self, length):
         """
@@ -474,37 +596,20 @@ class Series(Data):
         newindex = arange(length)
         return self.map(func, index=newindex)
 
-    def _makemasks(self, index=None, level=0):
+    def _groups(self, level=0):
         """
-        Internal function for generating masks for selecting values based on multi-index values.
+        Internal function for grouping positions of the index by multi-index values.
 
-        As all other multi-index functions will call this function, basic type-checking is also
-        performed at this stage.
+        Returns the group of each position, the values of the multi-index
+        for each group (one row per group, in sorted order), the positions
+        ordered by group, and where each group starts in that ordering.
+        Groups are computed once per set of levels and reused until the
+        index changes.
         """
-        if index is None:
-            index = self.index
-
-        try:
-            dims = len(array(index).shape)
-            if dims == 1:
-                index = array(index, ndmin=2).T
-        except:
-            raise TypeError('A multi-index must be convertible to a numpy ndarray')
-
-        try:
-            index = index[:, level]
-        except:
-            raise ValueError("Levels must be indices into individual elements of the index")
-
-        lenIdx = index.shape[0]
-        nlevels = index.shape[1]
-
-        combs = product(*[unique(index.T[i, :]) for i in range(nlevels)])
-        combs = array([l for l in combs])
-
-        masks = array([[array_equal(index[i], c) for i in range(lenIdx)] for c in combs])
-
-        return zip(*[(masks[x], combs[x]) for x in range(len(masks)) if masks[x].any()])
+        level = tuple(tupleize(level))
+        if level not in self._groups_cache:
+            self._groups_cache[level] = _factorize(self.index, list(level))
+        return self._groups_cache[level]
 
     def _map_by_index(self, function, level=0):
         """
@@ -515,16 +620,12 @@ class Series(Data):
         to to each of these groups separately. If this function is many-to-one, the result
         can be recast as a Series indexed by the unique index values used for grouping.
         """
-
-        if type(level) is int:
-            level = [level]
-
-        masks, ind = self._makemasks(index=self.index, level=level)
-        nMasks = len(masks)
-        newindex = array(ind)
+        codes, keys, order, starts = self._groups(level)
+        positions = [order[start:stop] for start, stop in zip(starts, list(starts[1:]) + [len(order)])]
+        newindex = keys
         if len(newindex[0]) == 1:
             newindex = ravel(newindex)
-        return self.map(lambda v: asarray([array(function(v[masks[x]])) for x in range(nMasks)]),
+        return self.map(lambda v: asarray([array(function(v[p])) for p in positions]),
                         index=newindex)
 
     def select_by_index(self, val, level=0, squeeze=False, filter=False, return_mask=False):
@@ -596,11 +697,9 @@ class Series(Data):
         p = product(*val)
         selected = set([x for x in p])
 
-        masks, ind = self._makemasks(index=self.index, level=level)
-        nmasks = len(masks)
-        masks = array([masks[x] for x in range(nmasks) if tuple(ind[x]) in selected])
-
-        final_mask = masks.any(axis=0)
+        codes, keys = self._groups(level)[:2]
+        chosen = [i for i in range(len(keys)) if tuple(keys[i]) in selected]
+        final_mask = isin(codes, chosen)
         if filter:
             final_mask = logical_not(final_mask)
 
@@ -618,7 +717,7 @@ class Series(Data):
         elif len(indFinal[1]) == 0:
             indFinal = arange(sum(final_mask))
 
-        result = self.map(lambda v: v[final_mask], index=indFinal)
+        result = self._select_mask(final_mask, indFinal)
 
         if return_mask:
             return result, final_mask
@@ -652,6 +751,9 @@ class Series(Data):
         """
         Compute the desired statistic for each uniue index values (across levels, if multi-index)
 
+        Statistics other than the median are computed with segmented
+        reductions for blocks of records at once.
+
         Parameters
         ----------
         stat : string
@@ -672,8 +774,35 @@ class Series(Data):
             'min': min,
             'count': size
         }
-        func = STATS[stat.lower()]
-        return self.aggregate_by_index(level=level, function=func)
+        stat = stat.lower()
+        func = STATS[stat]
+        if stat == 'median':
+            return self.aggregate_by_index(level=level, function=func)
+
+        # other statistics are segmented reductions over the index in grouped order
+        codes, keys, order, starts = self._groups(level)
+        counts = diff(append(starts, len(order)))
+        if len(keys[0]) == 1:
+            keys = ravel(keys)
+
+        def get(y):
+            grouped = y[:, order]
+            if stat == 'count':
+                return counts[None, :].repeat(len(y), axis=0)
+            if stat == 'min':
+                return minimum.reduceat(grouped, starts, axis=1)
+            if stat == 'max':
+                return maximum.reduceat(grouped, starts, axis=1)
+            sums = add.reduceat(grouped, starts, axis=1)
+            if stat == 'sum':
+                return sums
+            means = sums / counts.astype(sums.dtype if issubdtype(sums.dtype, floating) else float64)
+            if stat == 'mean':
+                return means
+            deviations = grouped - means.repeat(counts, axis=1)
+            return sqrt(add.reduceat(deviations ** 2, starts, axis=1) / counts.astype(means.dtype))
+
+        return self.map(get, index=keys, batch=batchsize(8 * 3 * len(order)))
 
     def sum_by_index(self, level=0):
         """
@@ -717,6 +846,79 @@ class Series(Data):
         """
         return self.stat_by_index(level=level, stat='count')
 
+    def stat_by_label(self, stat):
+        """
+        Compute the desired statistic across records that share a label.
+
+        Returns a Series with one record per unique label, in sorted order,
+        labeled by those values. Labels are factorized once, and records are
+        reduced in blocks with segmented reductions (local) or with a single
+        reduceByKey (spark).
+
+        Parameters
+        ----------
+        stat : string
+            Statistic to be computed: sum, mean, stdev, max, min, count
+        """
+        stat = stat.lower()
+        check_options(stat, ['sum', 'mean', 'stdev', 'max', 'min', 'count'])
+        if self.labels is None:
+            raise ValueError('Series must have labels to compute statistics by label')
+
+        unique_labels, codes = unique(ravel(self.labels), return_inverse=True)
+        codes = ravel(codes)
+
+        if self.mode == 'local':
+            records = self.values.reshape(-1, self.shape[-1])
+            n, mu, m2, total, lo, hi = _summarize_by_label(records, codes, len(unique_labels))
+            dtype = records.dtype
+
+        if self.mode == 'spark':
+            from ..stats import Summary
+            labels = self.labels
+            rdd = self.values.tordd()
+            summaries = rdd.map(lambda kv: (labels[kv[0]], Summary().merge(kv[1])))\
+                           .reduceByKey(lambda left, right: left.combine(right)).collectAsMap()
+            summaries = [summaries[label] for label in unique_labels]
+            n = array([summary.n for summary in summaries])
+            mu, m2, total, lo, hi = [array([getattr(summary, name) for summary in summaries])
+                                     for name in ['mu', 'm2', 'total', 'lo', 'hi']]
+            dtype = self.dtype
+
+        floats = dtype if issubdtype(dtype, floating) else float64
+        if stat == 'sum':
+            result = total
+        if stat == 'mean':
+            result = mu.astype(floats)
+        if stat == 'stdev':
+            result = sqrt(m2 / n[:, None]).astype(floats)
+        if stat == 'min':
+            result = lo
+        if stat == 'max':
+            result = hi
+        if stat == 'count':
+            result = n[:, None].repeat(self.shape[-1], axis=1)
+
+        return self._constructor(result, index=self.index, labels=unique_labels)
+
+    def mean_by_label(self):
+        """
+        Compute means across records for each unique label
+        """
+        return self.stat_by_label('mean')
+
+    def sum_by_label(self):
+        """
+        Compute sums across records for each unique label
+        """
+        return self.stat_by_label('sum')
+
+    def count_by_label(self):
+        """
+        Count the records for each unique label
+        """
+        return self.stat_by_label('count')
+
     def cov(self):
         """
         Compute covariance of a distributed matrix.
@@ -809,8 +1011,8 @@ class Series(Data):
         Make masks used by windowing functions
 
         Given a list of indices specifying window centers,
-        and a window size, construct a list of index arrays,
-        one per window, that index into the target array
+        and a window size, construct an array of positions
+        with one row per window, that index into the target array
 
         Parameters
         ----------
@@ -824,17 +1026,25 @@ class Series(Data):
         before = div[0]
         after = div[0] + div[1]
         index = asarray(self.index)
-        indices = asarray(indices)
-        if where(index == max(indices))[0][0] + after > len(index):
+        indices = asarray(indices).reshape(-1)
+
+        # position of the first occurrence of each center in the index
+        order = index.argsort(kind='mergesort')
+        found = searchsorted(index[order], indices).clip(0, len(index) - 1)
+        missing = index[order][found] != indices
+        if missing.any():
+            raise ValueError("Requested index %g not found" % indices[missing][0])
+        centers = order[found]
+
+        if (centers + after > len(index)).any():
             raise ValueError("Maximum requested index %g, with window %g, exceeds length %g"
-                             % (max(indices), window, len(index)))
-        if where(index == min(indices))[0][0] - before < 0:
+                             % (indices[centers.argmax()], window, len(index)))
+        if (centers - before < 0).any():
             raise ValueError("Minimum requested index %g, with window %g, is less than 0"
-                             % (min(indices), window))
-        masks = [arange(where(index == i)[0][0]-before, where(index == i)[0][0]+after, dtype='int') for i in indices]
-        return masks
+                             % (indices[centers.argmin()], window))
+        return centers[:, None] + arange(-before, after, dtype='int')[None, :]
 
-    def mean_by_window(self, indices, window):
+    def mean_by_window(self, indices, window, stack=False):
         """
         Average series across multiple windows specified by their centers.
 
@@ -845,10 +1055,29 @@ class Series(Data):
 
         window : int
             Window size
+
+        stack : bool, optional, default = False
+            If True, return the values in every window instead of their average,
+            with the windows along a new axis before the last.
         """
         masks = self._makewindows(indices, window)
-        newindex = arange(0, len(masks[0]))
-        return self.map(lambda x: mean([x[m] for m in masks], axis=0), index=newindex)
+        nwindows, length = masks.shape
+        newindex = arange(0, length)
+
+        if stack:
+            func = lambda x: x[:, masks]
+            value_shape = (nwindows, length)
+            nbytes = 8 * 2 * masks.size
+        else:
+            # averaging is a product with a matrix that sums each window position
+            floats = self.dtype if issubdtype(self.dtype, floating) else float64
+            operator = zeros((self.shape[-1], length), dtype=floats)
+            add.at(operator, (masks, arange(length)[None, :].repeat(nwindows, axis=0)), 1.0 / nwindows)
+            func = lambda x: dot(x, operator)
+            value_shape = (length,)
+            nbytes = 8 * 2 * (self.shape[-1] + length)
+
+        return self.map(func, index=newindex, value_shape=value_shape, batch=batchsize(nbytes))
 
     def subsample(self, sample_factor=2):
         """
@@ -859,11 +1088,11 @@ class Series(Data):
         sample_factor : positive integer, optional, default=2
             Factor for downsampling.
         """
-        if sample_factor < 0:
+        if sample_factor <= 0:
             raise Exception('Factor for subsampling must be postive, got %g' % sample_factor)
         s = slice(0, len(self.index), sample_factor)
         newindex = self.index[s]
-        return self.map(lambda v: v[s], index=newindex)
+        return self._select_mask(arange(len(self.index)) % sample_factor == 0, newindex)
 
     def downsample(self, sample_factor=2):
         """
@@ -874,47 +1103,71 @@ class Series(Data):
         sample_factor : positive integer, optional, default=2
             Factor for downsampling.
         """
-        if sample_factor < 0:
+        if sample_factor <= 0:
             raise Exception('Factor for subsampling must be postive, got %g' % sample_factor)
-        newlength = floor(len(self.index) / sample_factor)
-        func = lambda v: v[0:int(newlength * sample_factor)].reshape(-1, sample_factor).mean(axis=1)
+        newlength = int(floor(len(self.index) / sample_factor))
         newindex = arange(newlength)
-        return self.map(func, index=newindex)
+        end = newlength * sample_factor
+
+        # local data in memory are averaged in one operation over the whole array
+        if self.mode == 'local' and not self._lazy and not isdisk(self.values):
+            values = self.values[..., :end]
+            values = values.reshape(values.shape[:-1] + (newlength, sample_factor)).mean(axis=-1)
+            return self._constructor(values, index=newindex).__finalize__(self, noprop=('index',))
+
+        func = lambda v: v[:, :end].reshape(len(v), newlength, sample_factor).mean(axis=2)
+        return self.map(func, index=newindex, batch=batchsize(8 * 2 * len(self.index)))
 
     def fourier(self, freq=None):
         """
         Compute statistics of a Fourier decomposition on series data.
 
+        Coherence is the amplitude at a frequency relative to the
+        total amplitude, and phase is in radians in [0, 2 pi).
+
         Parameters
         ----------
-        freq : int
-            Digital frequency at which to compute coherence and phase
-        """
-        def get(y, freq):
-            y = y - mean(y)
-            nframes = len(y)
-            ft = fft.fft(y)
-            ft = ft[0:int(fix(nframes/2))]
-            ampFt = 2*abs(ft)/nframes
-            amp = ampFt[freq]
-            ampSum = sqrt(sum(ampFt**2))
-            co = amp / ampSum
-            ph = -(pi/2) - angle(ft[freq])
-            if ph < 0:
-                ph += pi * 2
-            return array([co, ph])
-
-        if freq >= int(fix(size(self.index)/2)):
+        freq : int or list of ints, optional, default = None
+            Digital frequencies at which to compute coherence and phase.
+            For a single frequency, the index will be ['coherence', 'phase'].
+            For a list, or if None (all frequencies below half the series
+            duration), the coherences for each frequency are followed by the
+            phases, with the index repeating 'coherence' and 'phase' accordingly.
+        """
+        nframes = size(self.index)
+        nfreqs = int(fix(nframes/2))
+
+        if freq is None:
+            freqs = arange(nfreqs)
+        else:
+            freqs = asarray(freq, dtype='int').reshape(-1)
+
+        if len(freqs) > 0 and freqs.max() >= nfreqs:
             raise Exception('Requested frequency, %g, is too high, '
-                            'must be less than half the series duration' % freq)
+                            'must be less than half the series duration' % freqs.max())
 
-        index = ['coherence', 'phase']
-        return self.map(lambda x: get(x, freq), index=index)
+        def get(y):
+            y = y - y.mean(axis=1)[:, None]
+            ft = fft.rfft(y, axis=1)[:, :nfreqs]
+            amp = 2 * abs(ft) / nframes
+            co = amp[:, freqs] / sqrt((amp ** 2).sum(axis=1))[:, None]
+            ph = -(pi/2) - angle(ft[:, freqs])
+            ph[ph < 0] += pi * 2
+            return concatenate((co, ph), axis=1)
+
+        if freq is not None and asarray(freq).ndim == 0:
+            index = ['coherence', 'phase']
+        else:
+            index = ['coherence'] * len(freqs) + ['phase'] * len(freqs)
+        return self.map(get, index=index, dtype=float64, batch=batchsize(nframes * 8 * 3))
 
     def convolve(self, signal, mode='full'):
         """
         Convolve series data against another signal.
 
+        Blocks of records are convolved at once, directly for short
+        signals, and with the fft for long signals.
+
         Parameters
         ----------
         signal : array
@@ -923,24 +1176,48 @@ class Series(Data):
         mode : str, optional, default='full'
             Mode of convolution, options are 'full', 'same', and 'valid'
         """
-
-        from numpy import convolve
+        check_options(mode, ['full', 'same', 'valid'])
 
         s = asarray(signal)
 
         n = size(self.index)
         m = size(s)
 
-        # use expected lengths to make a new index
+        # use expected lengths to make a new index, and find the results within the full convolution
         if mode == 'same':
             newmax = max(n, m)
+            start = (min(n, m) - 1) // 2
         elif mode == 'valid':
             newmax = max(m, n) - min(m, n) + 1
+            start = min(m, n) - 1
         else:
             newmax = n+m-1
+            start = 0
         newindex = arange(0, newmax)
 
-        return self.map(lambda x: convolve(x, signal, mode), index=newindex)
+        nfft = 2 ** int(ceil(log2(n + m - 1)))
+        if m <= 4 * log2(nfft):
+            def func(x):
+                dtype = result_type(x, s)
+                out = zeros((len(x), n + m - 1), dtype=dtype)
+                for k in range(m):
+                    out[:, k:k + n] += x * s[k]
+                return out[:, start:start + newmax]
+
+            nbytes = 8 * 2 * (n + m)
+        else:
+            transformed = fft.rfft(s, nfft)
+
+            def func(x):
+                dtype = result_type(x, s)
+                out = fft.irfft(fft.rfft(x, nfft) * transformed, nfft)[:, start:start + newmax]
+                if issubdtype(dtype, integer):
+                    out = rint(out)
+                return out.astype(dtype)
+
+            nbytes = 8 * 3 * nfft
+
+        return self.map(func, index=newindex, batch=batchsize(nbytes))
 
     def crosscorr(self, signal, lag=0):
         """
@@ -954,44 +1231,36 @@ class Series(Data):
         lag : int
             Range of lags to consider, will cover (-lag, +lag).
         """
-        from scipy.linalg import norm
-
         s = asarray(signal)
-        s = s - mean(s)
-        s = s / norm(s)
 
         if size(s) != size(self.index):
             raise Exception('Size of signal to cross correlate with, %g, '
                             'does not match size of series' % size(s))
 
-        # created a matrix with lagged signals
-        if lag is not 0:
-            shifts = range(-lag, lag+1)
-            d = len(s)
-            m = len(shifts)
-            sshifted = zeros((m, d))
-            for i in range(0, len(shifts)):
-                tmp = roll(s, shifts[i])
-                if shifts[i] < 0:
-                    tmp[(d+shifts[i]):] = 0
-                if shifts[i] > 0:
-                    tmp[:shifts[i]] = 0
-                sshifted[i, :] = tmp
-            s = sshifted
+        s = _unitnorm(array(s, ndmin=2, dtype=float64))[0]
+        d = len(s)
+        shifts = arange(-lag, lag + 1)
+
+        # correlate directly with lagged signals for few lags, otherwise use the fft
+        n = 2 ** int(ceil(log2(d + lag)))
+        if len(shifts) <= 4 * log2(n):
+            t = arange(d)[None, :] - shifts[:, None]
+            lagged = where((t >= 0) & (t < d), s[t % d], 0).T
+
+            def func(x):
+                return dot(_unitnorm(x.astype(float64), 0), lagged)
+
+            nbytes = 8 * (d + len(shifts))
         else:
-            shifts = [0]
+            transformed = fft.rfft(s, n).conj()
 
-        def get(y, s):
-            y = y - mean(y)
-            n = norm(y)
-            if n == 0:
-                b = zeros((s.shape[0],))
-            else:
-                y /= n
-                b = dot(s, y)
-            return b
+            def func(x):
+                full = fft.irfft(fft.rfft(_unitnorm(x.astype(float64), 0), n) * transformed, n)
+                return full[:, shifts % n]
+
+            nbytes = 8 * 3 * n
 
-        return self.map(lambda x: get(x, s), index=shifts)
+        return self.map(func, index=list(shifts), dtype=float64, batch=batchsize(nbytes))
 
     def detrend(self, method='linear', order=5):
         """
@@ -1012,16 +1281,19 @@ class Series(Data):
         if method == 'linear':
             order = 1
 
+        # orthonormal basis for polynomials of the given order over the index,
+        # fit to every record at once; subtracting the fit at the first point
+        # keeps the intercept, as that is the value of the fit at zero
+        n = size(self.index)
+        basis = qr(vander(linspace(-1, 1, n), order + 1))[0]
+        trend = (basis - basis[0]).T
+
         def func(y):
-            x = arange(len(y))
-            p = polyfit(x, y, order)
-            p[-1] = 0
-            yy = polyval(p, x)
-            return y - yy
+            return y - dot(dot(y, basis), trend)
 
-        return self.map(func)
+        return self.map(func, dtype=float64, batch=batchsize(n * 8 * 2))
 
-    def normalize(self, method='percentile', window=None, perc=20, offset=0.1):
+    def normalize(self, method='percentile', window=None, perc=20, offset=0.1, bins=100):
         """
         Normalize by subtracting and dividing by a baseline.
 
@@ -1034,52 +1306,67 @@ class Series(Data):
         ----------
         baseline : str, optional, default = 'percentile'
             Quantity to use as the baseline, options are 'mean', 'percentile',
-            'window', or 'window-exact'.
+            'window', 'window-exact', or 'window-approx'.
 
         window : int, optional, default = 6
             Size of window for baseline estimation,
-            for 'window' and 'window-exact' baseline only.
+            for 'window', 'window-exact', and 'window-approx' baseline only.
 
         perc : int, optional, default = 20
             Percentile value to use, for 'percentile',
-            'window', or 'window-exact' baseline only.
+            'window', 'window-exact', or 'window-approx' baseline only.
 
         offset : float, optional, default = 0.1
              Scalar added to baseline during division to avoid division by 0.
+
+        bins : int, optional, default = 100
+            Number of bins spanning the range of each record, for 'window-approx'
+            baseline only. The baseline differs from 'window-exact' by at most
+            half the range of the record divided by the number of bins.
+            Windows no wider than the number of bins are faster to compute
+            exactly, so for these 'window-approx' gives the 'window-exact' baseline.
         """
 
-        check_options(method, ['mean', 'percentile', 'window', 'window-exact'])
+        check_options(method, ['mean', 'percentile', 'window', 'window-exact', 'window-approx'])
 
         from warnings import warn
-        if not (method == 'window' or method == 'window-exact') and window is not None:
+        if not method.startswith('window') and window is not None:
             warn('Setting window without using method "window" has no effect')
 
+        n = len(self.index)
+        batch = False
+
         if method == 'mean':
-            baseFunc = mean
+            baseFunc = lambda x: x.mean(axis=1)[:, None]
 
         if method == 'percentile':
-            baseFunc = lambda x: percentile(x, perc)
+            baseFunc = lambda x: percentile(x, perc, axis=1)[:, None]
 
         if method == 'window':
             from scipy.ndimage.filters import percentile_filter
-            baseFunc = lambda x: percentile_filter(x.astype(float64), perc, window, mode='nearest')
+            baseFunc = lambda x: percentile_filter(x.astype(float64), perc, (1, window), mode='nearest')
 
-        if method == 'window-exact':
+        if method in ('window-exact', 'window-approx'):
             if window & 0x1:
-                left, right = (ceil(window/2), ceil(window/2) + 1)
+                left, right = (window + 1) // 2, (window + 1) // 2 + 1
             else:
-                left, right = (window/2, window/2)
+                left, right = window // 2, window // 2
 
-            n = len(self.index)
-            baseFunc = lambda x: asarray([percentile(x[max(ix-left, 0):min(ix+right+1, n)], perc)
-                                          for ix in arange(0, n)])
+            # the approximation costs as much per step as an exact window as wide as the bins
+            if method == 'window-exact' or min(n, left + right + 1) <= bins:
+                baseFunc = lambda x: _window_percentile(x, perc, left, right)
+                batch = batchsize(8 * 3 * (n + left + right + 2))
+            else:
+                baseFunc = lambda x: _window_percentile_approx(x, perc, left, right, bins)
+                batch = batchsize(8 * 3 * (n + bins))
 
         def get(y):
             b = baseFunc(y)
             return (y - b) / (b + offset)
 
-        return self.map(get)
+        return self.map(get, batch=batch or batchsize(8 * 3 * n))
 
+    @profiled()
     def toimages(self, chunk_size='auto'):
         """
         Converts to images data.
@@ -1102,10 +1389,15 @@ class Series(Data):
         n = len(self.shape) - 1
 
         if self.mode == 'spark':
-            return Images(self.values.swap(tuple(range(n)), (0,), size=chunk_size))
+            values = self.values.swap(tuple(range(n)), (0,), size=chunk_size)
 
-        if self.mode == 'local':
-            return Images(self.values.transpose((n,) + tuple(range(0, n))))
+        if self.mode == 'local' and isdisk(self.values):
+            values = transpose(self.values, (n,) + tuple(range(0, n)))
+
+        elif self.mode == 'local':
+            values = self.values.transpose((n,) + tuple(range(0, n)))
+
+        return Images(values).__finalize__(self, noprop=('labels',))
 
     def tobinary(self, path, prefix='series', overwrite=False, credentials=None):
         """
@@ -1126,3 +1418,298 @@ class Series(Data):
         """
         from thunder.series.writers import tobinary
         tobinary(self, path, prefix=prefix, overwrite=overwrite, credentials=credentials)
+
+
+def _unitnorm(x, constant=nan):
+    """
+    Center each row of a two-dimensional array and scale it to unit norm.
+
+    Rows that are constant are set to the given value,
+    by default nan, as with numpy.corrcoef.
+    """
+    x = x - x.mean(axis=1)[:, None]
+    norms = sqrt((x ** 2).sum(axis=1))
+    with errstate(divide='ignore', invalid='ignore'):
+        x = x / norms[:, None]
+    x[norms == 0] = constant
+    return x
+
+
+def _spans(values):
+    """
+    Check whether an array views all of the memory of the array that owns it.
+    """
+    owner = values
+    while isinstance(owner.base, ndarray):
+        owner = owner.base
+    return values.nbytes == owner.nbytes
+
+
+def _window_bounds(n, left, right):
+    """
+    First and last positions of windows around each of n points, clipped to the series.
+    """
+    ix = arange(n)
+    return (ix - left).clip(0, n - 1), (ix + right).clip(0, n - 1)
+
+
+def _window_percentile(x, perc, left, right):
+    """
+    Percentile of each row within a window sliding along the row.
+
+    Windows around each point extend left and right of the point,
+    and are truncated at the ends. Sorted windows are updated as the
+    window slides, removing the value leaving the window and inserting
+    the value entering it, and percentiles are interpolated as with
+    numpy.percentile. Narrow windows are updated for all rows at once,
+    wide windows one row at a time by bisection. As with numpy.percentile,
+    the percentile of a window containing NaN is NaN.
+    """
+    x = x.astype(float64)
+    rows, n = x.shape
+    first, last = _window_bounds(n, left, right)
+
+    # NaN compares false with everything, so it is sorted as inf and its windows masked
+    missing = _window_nans(x, first, last)
+    if missing is not None:
+        with errstate(invalid='ignore'):
+            out = _window_percentile(where(isnan(x), float64('inf'), x), perc, left, right)
+        out[missing] = nan
+        return out
+
+    if min(n, left + right + 1) > 128:
+        return array([_window_percentile_row(y, perc, first, last) for y in x])
+
+    # windows are padded with inf while they are shorter than the full width
+    width = min(n, left + right + 1)
+    window = zeros((rows, width + 1)) + float64('inf')
+    cols = arange(width + 1)
+    r = arange(rows)
+
+    def replace(window, old, new):
+        # the old value is at position start, the new value belongs at position stop,
+        # and values in between shift one position towards the start
+        start = (window < old[:, None]).sum(axis=1)
+        up = old < new
+        stop = (window < new[:, None]).sum(axis=1) - up
+        after = concatenate((window[:, 1:], window[:, -1:]), axis=1)
+        before = concatenate((window[:, :1], window[:, :-1]), axis=1)
+        between = (cols >= minimum(start, stop)[:, None]) & (cols <= maximum(start, stop)[:, None])
+        shifted = where(between & up[:, None], after, where(between, before, window))
+        shifted[r, stop] = new
+        return shifted
+
+    inf = zeros(rows) + float64('inf')
+    out = zeros((rows, n))
+    inserted, removed = 0, 0
+    for ix in range(n):
+        while inserted <= last[ix] and removed < first[ix]:
+            window = replace(window, x[:, removed], x[:, inserted])
+            inserted += 1
+            removed += 1
+        while inserted <= last[ix]:
+            window = replace(window, inf, x[:, inserted])
+            inserted += 1
+        while removed < first[ix]:
+            window = replace(window, x[:, removed], inf)
+            removed += 1
+        out[:, ix] = _interpolate(window, inserted - removed, perc)
+
+    return out
+
+
+def _window_nans(x, first, last):
+    """
+    Mask of windows that contain NaN, or None if no row contains NaN.
+    """
+    nans = isnan(x)
+    if not nans.any():
+        return None
+    counts = concatenate((zeros((x.shape[0], 1), dtype='int'), nans.cumsum(axis=1)), axis=1)
+    return counts[:, last + 1] > counts[:, first]
+
+
+def _window_percentile_row(y, perc, first, last):
+    """
+    Percentile of a single row within a sliding window, see _window_percentile.
+    """
+    from bisect import insort, bisect_left
+
+    values, first, last = y.tolist(), first.tolist(), last.tolist()
+    window = []
+    out = []
+    inserted, removed = 0, 0
+    for ix in range(len(values)):
+        while inserted <= last[ix]:
+            insort(window, values[inserted])
+            inserted += 1
+        while removed < first[ix]:
+            del window[bisect_left(window, values[removed])]
+            removed += 1
+        out.append(_interpolate(window, len(window), perc))
+
+    return out
+
+
+def _interpolate(window, size, perc):
+    """
+    Percentile of the first size values of sorted windows along the last axis.
+    """
+    rank = perc / 100.0 * (size - 1)
+    lo = int(floor(rank))
+    hi = min(lo + 1, size - 1)
+    if isinstance(window, list):
+        return window[lo] + (window[hi] - window[lo]) * (rank - lo)
+    return window[..., lo] + (window[..., hi] - window[..., lo]) * (rank - lo)
+
+
+def _window_percentile_approx(x, perc, left, right, bins):
+    """
+    Approximate percentile of each row within a window sliding along the row.
+
+    Values are assigned to equally spaced bins over the range of each row,
+    and percentiles are found from counts of bins within each window,
+    using the bin centers. Differs from the exact percentile by at most
+    half a bin width, and the cost grows with the number of bins rather
+    than with the window size. The percentile of a window containing NaN
+    is NaN.
+    """
+    x = x.astype(float64)
+    rows, n = x.shape
+    first, last = _window_bounds(n, left, right)
+
+    # NaN values are binned with the minimum, and their windows masked
+    missing = _window_nans(x, first, last)
+    if missing is not None:
+        nans = isnan(x)
+        x = where(nans, where(nans, float64('inf'), x).min(axis=1)[:, None], x)
+
+    lo = x.min(axis=1)[:, None]
+    with errstate(invalid='ignore'):
+        width = (x.max(axis=1)[:, None] - lo) / bins
+    with errstate(divide='ignore', invalid='ignore'):
+        binned = ((x - lo) / width).clip(0, bins - 1)
+    binned[~(width[:, 0] > 0)] = 0
+    binned = binned.astype('int')
+
+    # counts of each bin within the window, updated as the window slides
+    counts = zeros((rows, bins), dtype='int')
+    r = arange(rows)
+    centers = lo + (arange(bins) + 0.5) * width
+
+    out = zeros((rows, n))
+    inserted, removed = 0, 0
+    for ix in range(n):
+        while inserted <= last[ix]:
+            counts[r, binned[:, inserted]] += 1
+            inserted += 1
+        while removed < first[ix]:
+            counts[r, binned[:, removed]] -= 1
+            removed += 1
+        size = inserted - removed
+        rank = perc / 100.0 * (size - 1)
+        below = int(floor(rank))
+        above = min(below + 1, size - 1)
+        cumulative = counts.cumsum(axis=1)
+        lower = centers[r, (cumulative <= below).sum(axis=1)]
+        upper = centers[r, (cumulative <= above).sum(axis=1)]
+        out[:, ix] = lower + (upper - lower) * (rank - below)
+
+    if missing is not None:
+        out[missing] = nan
+    return out
+
+
+def _factorize(index, level):
+    """
+    Group positions of an index by the values at the given levels of a multi-index.
+
+    Each level is factorized separately, and the codes of all levels are
+    combined into one code per position, so only combinations of values
+    that occur are considered.
+
+    Parameters
+    ----------
+    index : array-like
+        Index, one- or two-dimensional (one row per position).
+
+    level : list of ints
+        Levels of the multi-index to group by.
+    """
+    try:
+        index = array(index)
+        if index.ndim == 1:
+            index = index[:, None]
+    except:
+        raise TypeError('A multi-index must be convertible to a numpy ndarray')
+
+    try:
+        index = index[:, level]
+    except:
+        raise ValueError("Levels must be indices into individual elements of the index")
+
+    factors = [unique(column, return_inverse=True) for column in index.T]
+    combined = ravel_multi_index([inverse for _, inverse in factors], [len(u) for u, _ in factors])
+    combinations, codes = unique(combined, return_inverse=True)
+    levels = unravel_index(combinations, [len(u) for u, _ in factors])
+    keys = array(list(zip(*[u[i] for (u, _), i in zip(factors, levels)])))
+
+    order = codes.argsort(kind='mergesort')
+    starts = searchsorted(codes[order], arange(len(combinations)))
+    return codes, keys, order, starts
+
+
+def _summarize_by_label(records, codes, nlabels):
+    """
+    Count, mean, sum of squared deviations, sum, min and max of records for each label.
+
+    Records are read in blocks within the memory budget. Within a block,
+    records are sorted by label and reduced with ufunc.reduceat, and
+    summaries of blocks are combined with the formulas of Chan et al.
+
+    Parameters
+    ----------
+    records : ndarray
+        Two-dimensional array with one record per row.
+
+    codes : ndarray
+        Label of each record, as integers from 0 to nlabels - 1.
+
+    nlabels : int
+        Number of labels.
+    """
+    length = records.shape[1]
+    # sums are accumulated in the type numpy.sum would promote to
+    accumulate = add.reduce(zeros(0, dtype=records.dtype)).dtype
+    n = zeros(nlabels, dtype='int')
+    mu = zeros((nlabels, length))
+    m2 = zeros((nlabels, length))
+    total = zeros((nlabels, length), dtype=accumulate)
+    lo = zeros((nlabels, length), dtype=records.dtype)
+    hi = zeros((nlabels, length), dtype=records.dtype)
+
+    size = batchsize(8 * 3 * length)
+    for start in range(0, len(records), size):
+        block_codes = codes[start:start + size]
+        order = block_codes.argsort(kind='mergesort')
+        present, starts = unique(block_codes[order], return_index=True)
+        block = array(records[start:start + size])[order]
+
+        counts = diff(append(starts, len(block)))
+        sums = add.reduceat(block, starts, axis=0, dtype=accumulate)
+        means = sums / counts[:, None].astype(float64)
+        squares = add.reduceat((block - means.repeat(counts, axis=0)) ** 2, starts, axis=0)
+
+        first = (n[present] == 0)[:, None]
+        combined = n[present] + counts
+        delta = means - mu[present]
+        mu[present] += delta * (counts / combined.astype(float64))[:, None]
+        m2[present] += squares + delta ** 2 * (n[present] * counts / combined.astype(float64))[:, None]
+        total[present] += sums
+        lows = minimum.reduceat(block, starts, axis=0)
+        highs = maximum.reduceat(block, starts, axis=0)
+        lo[present] = where(first, lows, minimum(lo[present], lows))
+        hi[present] = where(first, highs, maximum(hi[present], highs))
+        n[present] = combined
+
+    return n, mu, m2, total, lo, hi
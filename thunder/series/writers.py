@@ -1,5 +1,9 @@
-from numpy import prod, unravel_index
+from numpy import unravel_index
 
+from ..profiling import profiled
+
+
+@profiled('series.tobinary')
 def tobinary(series, path, prefix='series', overwrite=False, credentials=None):
     """
     Writes out data to binary format.
@@ -50,14 +54,16 @@ def tobinary(series, path, prefix='series', overwrite=False, credentials=None):
         binary.foreach(writer.write)
 
     else:
-        basedims = [series.shape[d] for d in series.baseaxes]
+        from thunder.disk import iterblocks
 
-        def split(k):
-            ind = unravel_index(k, basedims)
-            return ind, series.values[ind]
+        basedims = [series.shape[d] for d in series.baseaxes]
+        records = series.values.reshape(-1, series.shape[-1])
 
-        buf = tobuffer([split(i) for i in range(prod(basedims))])
-        [writer.write(b) for b in buf]
+        # series stored on disk are written as one file per block of records
+        for s, block in iterblocks(records):
+            keys = zip(*unravel_index(range(s.start, s.stop), basedims))
+            buf = tobuffer(zip(keys, block))
+            [writer.write(b) for b in buf]
 
     shape = series.shape
     dtype = series.dtype
@@ -0,0 +1,183 @@
+"""
+Mergeable summary statistics of records.
+"""
+from numpy import asarray, newaxis, prod, float64, minimum, maximum, sqrt, issubdtype, floating
+
+from .utils import tupleize
+
+
+class Summary(object):
+    """
+    Count, sum, mean, variance, min, and max of records, computed in one pass.
+
+    Records can be added one at a time, or in blocks, and summaries of
+    different records can be combined. Means and variances are updated
+    with the Welford and Chan et al. formulas, so they remain accurate
+    for long recordings.
+
+    Parameters
+    ----------
+    records : iterable, optional, default = ()
+        Records to add to the summary.
+    """
+    def __init__(self, records=()):
+        self.n = 0
+        self.mu = None
+        self.m2 = None
+        self.total = None
+        self.lo = None
+        self.hi = None
+        self.dtype = None
+
+        for record in records:
+            self.merge(record)
+
+    @classmethod
+    def of(cls, records, axis=0, budget=None):
+        """
+        Summarize an array of records.
+
+        The array is split along the first of the axes into blocks
+        that fit within the memory budget, and summaries of the
+        blocks are combined.
+
+        Parameters
+        ----------
+        records : ndarray
+            Array of records.
+
+        axis : int or tuple, optional, default = 0
+            Axes that index records.
+
+        budget : int, optional, default = None
+            Number of bytes, if None will use the memory budget.
+        """
+        from .disk import batchsize
+
+        records = asarray(records)
+        axis = tupleize(axis)
+        summary = cls()
+        if records.size == 0:
+            return summary
+
+        first = min(axis)
+        length = records.shape[first]
+        size = batchsize(8 * 3 * (records.size // length), budget)
+        index = [slice(None)] * records.ndim
+        for start in range(0, length, size):
+            index[first] = slice(start, start + size)
+            summary.combine(cls._block(records[tuple(index)], axis))
+        return summary
+
+    @classmethod
+    def _block(cls, records, axis):
+        """
+        Summarize a block of records that fits in memory.
+        """
+        summary = cls()
+        mu = records.mean(axis=axis, dtype=float64, keepdims=True)
+        summary.n = int(prod([records.shape[i] for i in axis]))
+        summary.dtype = records.dtype
+        summary.total = records.sum(axis=axis)
+        summary.mu = mu.squeeze(axis=axis)
+        summary.m2 = ((records - mu) ** 2).sum(axis=axis)
+        summary.lo = records.min(axis=axis)
+        summary.hi = records.max(axis=axis)
+        return summary
+
+    def merge(self, record):
+        """
+        Add a single record to the summary.
+
+        Parameters
+        ----------
+        record : ndarray
+            Record to add.
+        """
+        record = asarray(record)
+        if self.n == 0:
+            self.n = 1
+            self.dtype = record.dtype
+            self.total = record[newaxis].sum(axis=0)
+            self.mu = record.astype(float64)
+            self.m2 = 0.0 * self.mu
+            self.lo = record.copy()
+            self.hi = record.copy()
+        else:
+            self.n += 1
+            delta = record - self.mu
+            self.mu = self.mu + delta / self.n
+            self.m2 = self.m2 + delta * (record - self.mu)
+            self.total = self.total + record
+            self.lo = minimum(self.lo, record)
+            self.hi = maximum(self.hi, record)
+        return self
+
+    def combine(self, other):
+        """
+        Combine with the summary of other records.
+
+        Parameters
+        ----------
+        other : Summary
+            Summary to combine with.
+        """
+        if other.n == 0:
+            return self
+        if self.n == 0:
+            self.__dict__.update(other.__dict__)
+            return self
+
+        n = self.n + other.n
+        delta = other.mu - self.mu
+        self.mu = self.mu + delta * (other.n / float64(n))
+        self.m2 = self.m2 + other.m2 + delta ** 2 * (self.n * float64(other.n) / n)
+        self.total = self.total + other.total
+        self.lo = minimum(self.lo, other.lo)
+        self.hi = maximum(self.hi, other.hi)
+        self.n = n
+        return self
+
+    def _float(self, value):
+        # statistics of floating point records keep their precision, as in numpy
+        if issubdtype(self.dtype, floating):
+            return value.astype(self.dtype)
+        return value
+
+    def _check(self):
+        if self.n == 0:
+            raise ValueError('Cannot compute statistics without any records')
+
+    @property
+    def count(self):
+        return self.n
+
+    @property
+    def sum(self):
+        self._check()
+        return self.total
+
+    @property
+    def mean(self):
+        self._check()
+        return self._float(self.mu)
+
+    @property
+    def var(self):
+        self._check()
+        return self._float(self.m2 / self.n)
+
+    @property
+    def std(self):
+        self._check()
+        return self._float(sqrt(self.m2 / self.n))
+
+    @property
+    def min(self):
+        self._check()
+        return self.lo
+
+    @property
+    def max(self):
+        self._check()
+        return self.hi
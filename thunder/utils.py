@@ -1,15 +1,89 @@
+import sys
 import logging
+from numpy import ndarray, concatenate
 
 def notsupported(mode):
     logging.getLogger('thunder').warn("Operation not supported in '%s' mode" % mode)
     pass
 
-def check_spark():
-    SparkContext = False
-    try:
-        from pyspark import SparkContext
-    finally:
-        return SparkContext
+def isspark(engine):
+    """
+    Check whether an engine is a SparkContext.
+
+    Does not import pyspark: if it has not been imported,
+    the engine cannot be a SparkContext.
+    """
+    pyspark = sys.modules.get('pyspark')
+    return pyspark is not None and isinstance(engine, pyspark.SparkContext)
+
+def isbolt(values):
+    """
+    Check whether values are a spark bolt array (or chunked bolt array).
+
+    Does not import bolt: if it has not been imported,
+    the values cannot be a bolt array.
+    """
+    array = sys.modules.get('bolt.spark.array')
+    chunk = sys.modules.get('bolt.spark.chunk')
+    return (array is not None and isinstance(values, array.BoltArraySpark)) or \
+           (chunk is not None and isinstance(values, chunk.ChunkedArray))
+
+def tupleize(arg):
+    """
+    Coerce singletons, lists, and ndarrays to tuples.
+    """
+    if arg is None:
+        return None
+    if isinstance(arg, tuple):
+        return arg
+    if hasattr(arg, '__iter__') and not isinstance(arg, str):
+        return tuple(arg)
+    return (arg,)
+
+def inshape(shape, axes):
+    """
+    Check that a list of axes are contained within an array shape.
+    """
+    valid = all([(axis < len(shape)) and (axis >= 0) for axis in axes])
+    if not valid:
+        raise ValueError("axes not valid for an ndarray of shape: %s" % str(shape))
+
+def slicify(slc, dim):
+    """
+    Convert an int to a slice of length one, and give a slice
+    defined, nonnegative start and stop from a known dim.
+    """
+    if isinstance(slc, slice):
+        start = 0 if slc.start is None else slc.start
+        stop = dim if slc.stop is None else slc.stop
+        step = 1 if slc.step is None else slc.step
+        if start < 0: start += dim
+        if stop < 0: stop += dim
+        if step > 0:
+            if start < 0: start = 0
+            if stop > dim: stop = dim
+        else:
+            if stop < 0: stop = -1
+            if start > dim: start = dim - 1
+        return slice(start, stop, step)
+
+    elif isinstance(slc, int):
+        if slc < 0:
+            slc += dim
+        return slice(slc, slc + 1, 1)
+
+    else:
+        raise ValueError("Type for slice %s not recognized" % type(slc))
+
+def allstack(vals, depth=0):
+    """
+    Rebuild an array from nested lists of chunks, where each level
+    of nesting represents a dimension of the original array.
+    """
+    if type(vals[0]) is ndarray:
+        return concatenate(vals, axis=depth)
+    else:
+        return concatenate([allstack(x, depth + 1) for x in vals], axis=depth)
 
 def check_options(option, valid):
     if option not in valid: